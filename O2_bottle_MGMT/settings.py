@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Removes itself unless SQL_PROFILING is on
+    'bottle_MGMT.middleware.SQLProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -128,3 +130,56 @@ MEDIA_ROOT = BASE_DIR
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Shared by every worker process on the host (the same scope as the SQLite database),
+# so a cache invalidation such as Bottle.invalidate_inventory_snapshot() reaches all of them.
+# A per-process LocMemCache would leave other workers serving stale inventory counts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Rendered bill PDFs (content-addressed cache) and the worker pool that renders them
+BILL_PDF_CACHE_DIR = BASE_DIR / 'bill_pdfs'
+BILL_PDF_WORKERS = 2
+
+# Processes used to render PDFs for bill ZIP exports. Each web worker process starts one
+# pool of this size on its first export and shares it between concurrent exports.
+BILL_EXPORT_PROCESSES = 4
+
+# TransactionPhoto variants: bounding boxes and the worker pool that builds them
+PHOTO_THUMBNAIL_SIZE = (320, 320)
+PHOTO_WEB_SIZE = (1600, 1600)
+PHOTO_VARIANT_WORKERS = 2
+
+# Stream uploads to temporary files in chunks (hashing them for photo storage) instead of buffering in memory
+FILE_UPLOAD_HANDLERS = ['bottle_MGMT.upload_handlers.HashingTemporaryFileUploadHandler']
+
+# Media served by serve_media. MEDIA_ROOT is the project directory, so only these
+# top-level upload directories are reachable.
+MEDIA_SERVE_DIRS = ['bottle_photos', 'upi_qr']
+# None streams files from Django. 'x-sendfile' (Apache mod_xsendfile) or
+# 'x-accel-redirect' (nginx: an internal location at MEDIA_ACCEL_REDIRECT_PREFIX
+# aliased to MEDIA_ROOT) hand the bytes to the web server instead.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Per-request SQL profiling (bottle_MGMT.middleware): query counts and DB time logged
+# to "bottle_MGMT.sql_profile", repeated query shapes flagged, and the last
+# SQL_PROFILE_HISTORY requests shown to staff at /debug/profile/
+SQL_PROFILING = False
+SQL_PROFILE_HISTORY = 50
+SQL_PROFILE_REPEAT_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'bottle_MGMT.sql_profile': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -17,7 +17,6 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.conf import settings
-from django.conf.urls.static import static
 from bottle_MGMT import views
 
 urlpatterns = [
@@ -25,14 +24,20 @@ urlpatterns = [
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('delivery-dashboard/', views.delivery_dashboard, name='delivery_dashboard'),
     path('clients/', views.client_list, name='client_list'),
+    path('clients/export/', views.export_balances_csv, name='export_balances_csv'),
+    path('clients/search/', views.client_typeahead, name='client_typeahead'),
     path('clients/create/', views.client_create, name='client_create'),
     path('transactions/', views.transaction_list, name='transaction_list'),
     path('transactions/create/', views.transaction_create, name='transaction_create'),
+    path('transactions/delivery-run/', views.delivery_run, name='delivery_run'),
+    path('transactions/export/', views.export_transactions_csv, name='export_transactions_csv'),
     path('reports/', views.reports_view, name='reports'),
     path('inventory/', views.inventory_view, name='inventory'),
+    path('inventory/snapshot/', views.inventory_snapshot_view, name='inventory_snapshot'),
     path('inventory/add-bottles/', views.add_bottles_view, name='add_bottles'),
     path('inventory/bottle/<str:code>/photos/', views.bottle_photos_view, name='bottle_photos'),
     path('debug-photos/', views.debug_photos, name='debug_photos'),
+    path('debug/profile/', views.debug_profile, name='debug_profile'),
     path('pricing/', views.pricing_view, name='pricing'),
     path('logout/', views.logout_view, name='logout'),
     path('clients/<int:client_id>/bill/', views.generate_bill, name='generate_bill'),
@@ -40,6 +45,8 @@ urlpatterns = [
     path('clients/<int:client_id>/custom-billing/', views.custom_billing_view, name='custom_billing'),
     path('clients/<int:client_id>/create-custom-bill/', views.create_custom_bill, name='create_custom_bill'),
     path('clients/<int:client_id>/bill-history/', views.bill_history, name='bill_history'),
+    path('bills/export/', views.export_bills_zip, name='export_bills_zip'),
+    path('bills/export/csv/', views.export_bills_csv, name='export_bills_csv'),
     path('bills/<int:bill_id>/mark-paid/', views.mark_bill_paid, name='mark_bill_paid'),
     path('bills/<int:bill_id>/delete/', views.delete_bill, name='delete_bill'),
     path('sales/', views.sales_analytics, name='sales_analytics'),
@@ -49,6 +56,7 @@ urlpatterns = [
     path('categories/<int:category_id>/edit/', views.category_edit, name='category_edit'),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media; see MEDIA_SENDFILE in settings for handing the bytes to the web server
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", views.serve_media, name='serve_media'),
+]
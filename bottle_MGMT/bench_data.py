@@ -0,0 +1,321 @@
+"""
+Synthetic data for benchmarking: clients, bottles, transactions, monthly
+bills and photos, generated reproducibly from a seed.
+
+Transactions are simulated in date order so the data is internally
+consistent: deliveries only take in-stock bottles, returns only bring back
+bottles the client holds, and final bottle statuses, movements, balances and
+the sales rollup all agree with the transaction history. Busy clients get
+most of the traffic and most transactions carry a handful of bottles, like
+the real delivery rounds. Every completed month of a client's transactions
+is covered by one auto bill dated at the start of the next month.
+
+benchmark_urls() lists every project URL with its parameters filled from the
+data, for the benchmark_views command and the query-count tests.
+"""
+import io
+import random
+import re
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction as db_transaction
+from django.db.models import Count
+from django.urls import URLPattern, get_resolver
+from django.utils import timezone
+
+from .models import (
+    Bill, Bottle, BottleCategory, BottleMovement, BottlePricing, Client, ClientBottleBalance,
+    DailySalesRollup, Transaction, TransactionPhoto,
+)
+from .storage import photo_storage
+from .views import ADMIN_USERNAME, create_default_users
+
+CATEGORIES = [('Bench 20L', 'BNA'), ('Bench 10L', 'BNB'), ('Bench 5L', 'BNC')]
+CATEGORY_WEIGHTS = [6, 3, 1]
+# Bottles per transaction: mostly a few, occasionally a dozen
+BOTTLES_PER_TRANSACTION = list(range(1, 13))
+BOTTLES_PER_TRANSACTION_WEIGHTS = [30, 22, 15, 10, 7, 5, 4, 3, 2, 1, 1, 1]
+# Share of bottles out with clients that returns pull the simulation towards
+TARGET_UTILISATION = 0.6
+PHOTO_POOL_SIZE = 24
+BATCH_SIZE = 500
+# Delivers the seeded transactions when seed_bench_data is not given drivers
+BENCH_DRIVER = 'bench-driver'
+
+FIRST_NAMES = ['Asha', 'Ravi', 'Meena', 'Vikram', 'Priya', 'Arjun', 'Kavita', 'Suresh', 'Neha', 'Imran', 'Lakshmi', 'Joseph']
+LAST_NAMES = ['Patel', 'Sharma', 'Iyer', 'Khan', 'Reddy', 'Das', 'Menon', 'Singh', 'Gupta', 'Fernandes', 'Nair', 'Joshi']
+BUSINESSES = ['Traders', 'Caterers', 'Clinic', 'Motors', 'Textiles', 'Hotel', 'Bakery', 'Pharma', 'Electricals', 'Hostel']
+CITIES = ['Pune', 'Nashik', 'Surat', 'Indore', 'Nagpur', 'Vadodara']
+
+# Ends the benchmark client's session
+SKIPPED_URLS = {'logout'}
+# Extra requests for the filters and formats the plain URLs do not exercise
+VARIANTS = [
+    ('client_list', {'q': 'patel traders'}),
+    ('client_typeahead', {'q': 'pat'}),
+    ('transaction_list', {'type': 'delivered'}),
+    ('inventory', {'q': 'BNA 100-400'}),
+    ('inventory', {'status': 'delivered'}),
+    ('generate_bill', {'format': 'pdf'}),
+]
+ROUTE_PARAM_RE = re.compile(r'<(?:\w+:)?(\w+)>')
+# Status a working GET returns, by URL name, where it is not 200; any other status is a failure.
+# create_custom_bill only takes POSTs and sends a GET back to the custom billing page.
+EXPECTED_STATUS = {'create_custom_bill': 302}
+
+
+def bench_series():
+    return [series for _, series in CATEGORIES]
+
+
+def make_client(rng, index):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    has_company = rng.random() < 0.6
+    return Client(
+        name=f'{first} {last} {index:05d}',
+        contact=f'9{rng.randrange(10 ** 9):09d}',
+        alt_contact=f'8{rng.randrange(10 ** 9):09d}' if rng.random() < 0.3 else None,
+        email=f'{first.lower()}.{last.lower()}{index}@example.com',
+        address=f'{rng.randint(1, 400)}, Sector {rng.randint(1, 40)}, {rng.choice(CITIES)}',
+        company_name=f'{last} {rng.choice(BUSINESSES)}' if has_company else None,
+        gst_number=f'27{rng.randrange(10 ** 10):010d}Z{rng.randint(1, 9)}' if has_company else None,
+    )
+
+
+def make_photo_pool(rng, size):
+    """Store `size` distinct small JPEGs; returns their storage names"""
+    from PIL import Image, ImageDraw
+
+    storage = photo_storage()
+    names = []
+    for i in range(size):
+        image = Image.new('RGB', (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(6):
+            x, y = rng.randrange(600), rng.randrange(440)
+            draw.rectangle([x, y, x + 40, y + 40], fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+        names.append(storage.save(f'bottle_photos/bench_{i}.jpg', ContentFile(buffer.getvalue())))
+    return names
+
+
+def seed_bench_data(clients, bottles, transactions, seed=1, days=365, photo_ratio=0.2, paid_ratio=0.7, drivers=None):
+    """
+    Insert the generated rows in one atomic block; returns {model label: rows created}.
+    Transactions are delivered by drivers and bills generated by the first of them
+    (default: a BENCH_DRIVER user).
+    """
+    if Bottle.objects.filter(series__in=bench_series()).exists():
+        raise ValueError('Benchmark bottles already exist; seed into a fresh database.')
+
+    rng = random.Random(seed)
+    # History ends at today's midnight, so runs on the same day produce identical rows
+    now = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=days)
+    price = BottlePricing.get_solo().price
+    counts = {}
+
+    with db_transaction.atomic():
+        users = list(drivers or [User.objects.get_or_create(username=BENCH_DRIVER)[0]])
+        categories = [BottleCategory.objects.get_or_create(name=name)[0] for name, _ in CATEGORIES]
+
+        new_clients = Client.objects.bulk_create(
+            [make_client(rng, i) for i in range(clients)], batch_size=BATCH_SIZE,
+        )
+        # Zipf-like traffic: the first clients are the busiest
+        client_weights = [1 / (rank + 1) for rank in range(len(new_clients))]
+
+        next_number = dict.fromkeys(bench_series(), 1)
+        new_bottles = []
+        for _ in range(bottles):
+            index = rng.choices(range(len(CATEGORIES)), CATEGORY_WEIGHTS)[0]
+            series = CATEGORIES[index][1]
+            new_bottles.append(Bottle(code=f'{series}-{next_number[series]}', category=categories[index]))
+            next_number[series] += 1
+        new_bottles = Bottle.objects.bulk_create(new_bottles, batch_size=BATCH_SIZE)
+
+        # Simulate the rounds in date order
+        in_stock = [bottle.id for bottle in new_bottles]
+        held = {}
+        dates = sorted(start + timedelta(seconds=rng.uniform(0, days * 86400)) for _ in range(transactions))
+        current_month = (now.year, now.month)
+        planned = []
+        for date in dates:
+            client = rng.choices(new_clients, client_weights)[0]
+            holding = held.setdefault(client.id, [])
+            size = rng.choices(BOTTLES_PER_TRANSACTION, BOTTLES_PER_TRANSACTION_WEIGHTS)[0]
+            utilisation = 1 - len(in_stock) / len(new_bottles)
+            if holding and (rng.random() < utilisation / (2 * TARGET_UTILISATION) or not in_stock):
+                transaction_type, pool = 'returned', holding
+            elif in_stock:
+                transaction_type, pool = 'delivered', in_stock
+            else:
+                continue
+            picked = []
+            for _ in range(min(size, len(pool))):
+                # Swap-remove keeps picking O(1)
+                position = rng.randrange(len(pool))
+                pool[position], pool[-1] = pool[-1], pool[position]
+                picked.append(pool.pop())
+            (holding if transaction_type == 'delivered' else in_stock).extend(picked)
+
+            local = timezone.localtime(date)
+            planned.append((
+                Transaction(
+                    client=client,
+                    date=date,
+                    delivered_by=rng.choice(users),
+                    transaction_type=transaction_type,
+                    billed=(local.year, local.month) < current_month,
+                ),
+                picked,
+            ))
+
+        photo_names = make_photo_pool(rng, PHOTO_POOL_SIZE) if photo_ratio > 0 and planned else []
+        counts['transactions'] = counts['bottle_links'] = counts['photos'] = 0
+        for offset in range(0, len(planned), BATCH_SIZE):
+            batch = planned[offset:offset + BATCH_SIZE]
+            saved = Transaction.objects.bulk_create([txn for txn, _ in batch])
+            bottle_ids = [ids for _, ids in batch]
+            Through = Transaction.bottles.through
+            links = [
+                Through(transaction_id=txn.id, bottle_id=bottle_id)
+                for txn, ids in zip(saved, bottle_ids)
+                for bottle_id in ids
+            ]
+            Through.objects.bulk_create(links, batch_size=BATCH_SIZE)
+            BottleMovement.objects.bulk_create(BottleMovement.for_transactions(saved, bottle_ids), batch_size=BATCH_SIZE)
+            photos = [
+                TransactionPhoto(transaction_id=txn.id, image=rng.choice(photo_names))
+                for txn in saved if photo_names and rng.random() < photo_ratio
+                for _ in range(rng.randint(1, 3))
+            ]
+            TransactionPhoto.objects.bulk_create(photos, batch_size=BATCH_SIZE)
+            counts['transactions'] += len(saved)
+            counts['bottle_links'] += len(links)
+            counts['photos'] += len(photos)
+
+        delivered_ids = [bottle_id for holding in held.values() for bottle_id in holding]
+        for offset in range(0, len(delivered_ids), BATCH_SIZE):
+            Bottle.objects.filter(id__in=delivered_ids[offset:offset + BATCH_SIZE]).update(status='delivered')
+
+        counts['bills'] = create_monthly_bills(rng, [txn for txn, _ in planned if txn.billed], price, users, paid_ratio)
+        ClientBottleBalance.rebuild(new_clients)
+        DailySalesRollup.rebuild()
+    Bottle.invalidate_inventory_snapshot()
+
+    counts['clients'] = len(new_clients)
+    counts['bottles'] = len(new_bottles)
+    return counts
+
+
+def create_monthly_bills(rng, billed_transactions, price, users, paid_ratio):
+    """One auto bill per client and month, counted the way Bill.create_auto_bills counts"""
+    months = {}
+    for txn in billed_transactions:
+        local = timezone.localtime(txn.date)
+        counts = months.setdefault((txn.client_id, local.year, local.month), {'delivered': 0, 'returned': 0})
+        counts[txn.transaction_type] += 1
+
+    bills = []
+    for (client_id, year, month), counts in sorted(months.items()):
+        bill_date = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1, 9))
+        pending = counts['delivered'] - counts['returned']
+        paid = rng.random() < paid_ratio
+        bills.append(Bill(
+            client_id=client_id,
+            bill_date=bill_date,
+            delivered_bottles=counts['delivered'],
+            returned_bottles=counts['returned'],
+            pending_bottles=pending,
+            price_per_bottle=price,
+            total_amount=pending * price,
+            generated_by=users[0],
+            bill_type='auto',
+            paid=paid,
+            paid_date=bill_date + timedelta(days=rng.randint(1, 20)) if paid else None,
+            paid_by=users[0] if paid else None,
+        ))
+    bill_dates = [bill.bill_date for bill in bills]
+    bills = Bill.objects.bulk_create(bills, batch_size=BATCH_SIZE)
+    # bill_date is auto_now_add, so the back-dating has to be a second write
+    for bill, bill_date in zip(bills, bill_dates):
+        bill.bill_date = bill_date
+    Bill.objects.bulk_update(bills, ['bill_date'], batch_size=BATCH_SIZE)
+    return len(bills)
+
+
+def benchmark_user():
+    """The default admin user; views check for that username, so another superuser would be turned away"""
+    create_default_users()
+    return User.objects.get(username=ADMIN_USERNAME)
+
+
+def sample_params(seeded):
+    """
+    Values for the URL parameters: the busiest client, its latest bill (unpaid
+    if it has one, so the mark-paid and delete pages render their forms) and
+    the most-moved bottle. With seeded=True only generated rows are picked.
+    """
+    transactions = Transaction.objects.order_by()
+    movements = BottleMovement.objects.order_by()
+    categories = BottleCategory.objects.order_by('id')
+    photos = TransactionPhoto.objects.order_by('-id')
+    if seeded:
+        transactions = transactions.filter(bottles__series__in=bench_series())
+        movements = movements.filter(bottle__series__in=bench_series())
+        categories = categories.filter(name__in=[name for name, _ in CATEGORIES])
+
+    params = {}
+    busiest = transactions.values('client_id').annotate(n=Count('id', distinct=True)).order_by('-n').first()
+    if busiest:
+        params['client_id'] = busiest['client_id']
+        bill = Bill.objects.filter(client_id=busiest['client_id']).order_by('paid', '-bill_date', '-id').first()
+        if bill:
+            params['bill_id'] = bill.id
+    moved = movements.values('bottle__code').annotate(n=Count('id')).order_by('-n').first()
+    if moved:
+        params['code'] = moved['bottle__code']
+    category = categories.first()
+    if category:
+        params['category_id'] = category.id
+    photo = photos.first()
+    if photo:
+        params['path'] = photo.image.name
+    return params
+
+
+def benchmark_urls(params):
+    """
+    (url name, label, url) for every project URL whose parameters can be filled,
+    plus VARIANTS. Labels use the route, so results compare across sizes and runs.
+    """
+    patterns = [
+        pattern for pattern in get_resolver().url_patterns
+        # Included URLconfs (the Django admin) are not ours to benchmark
+        if isinstance(pattern, URLPattern) and pattern.name not in SKIPPED_URLS
+    ]
+    # Variants go on the route of their name with the most parameters (generate_bill with a bill id)
+    variant_routes = {}
+    for pattern in patterns:
+        route = str(pattern.pattern)
+        best = variant_routes.get(pattern.name)
+        if best is None or len(ROUTE_PARAM_RE.findall(route)) > len(ROUTE_PARAM_RE.findall(best)):
+            variant_routes[pattern.name] = route
+
+    urls = []
+    for pattern in patterns:
+        route = str(pattern.pattern)
+        if any(name not in params for name in ROUTE_PARAM_RE.findall(route)):
+            continue
+        url = '/' + ROUTE_PARAM_RE.sub(lambda match: str(params[match.group(1)]), route)
+        urls.append((pattern.name, f'/{route}', url))
+        for variant_name, query in VARIANTS:
+            if variant_name == pattern.name and variant_routes[variant_name] == route:
+                query = urlencode(query)
+                urls.append((pattern.name, f'/{route}?{query}', f'{url}?{query}'))
+    return urls
@@ -0,0 +1,245 @@
+"""
+Bill PDF rendering and the on-disk cache in front of it.
+
+PDFs are stored as BILL_PDF_CACHE_DIR/bill_<id>_<fingerprint>.pdf, where the
+fingerprint is a hash of every bill field that ends up on the page (plus the
+paid state). A changed bill therefore never matches a stale file. Rendering is
+normally done by a small worker pool right after the bill is created, so a
+download is just a file send.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils.text import get_valid_filename
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+
+def bill_pdf_data(bill):
+    """Plain, picklable values printed on the bill"""
+    return {
+        'bill_id': bill.id,
+        'client_name': bill.client.name,
+        'client_address': bill.client.address,
+        'client_contact': bill.client.contact,
+        'bill_date': bill.bill_date.strftime('%Y-%m-%d'),
+        'price': str(bill.price_per_bottle),
+        'pending': bill.pending_bottles,
+        'total': str(bill.total_amount),
+        'generated_by': bill.generated_by.username if bill.generated_by else '',
+        'paid': bill.paid,
+    }
+
+
+def render_bill_pdf(data):
+    """Render the bill layout to PDF bytes. Pure function of `data`, safe to run in a worker process."""
+    # Create a BytesIO object to receive PDF data.
+    buffer = BytesIO()
+    # Create a canvas.
+    p = canvas.Canvas(buffer, pagesize=letter)
+
+    # Set document information
+    p.setTitle("Bill")
+    p.setAuthor("O2 Bottle Management System")
+    p.setSubject("Bill for " + data["client_name"])
+    p.setKeywords("O2 Bottle, Bill, Management")
+
+    # Set font
+    p.setFont("Helvetica", 12)
+
+    # Draw title
+    p.drawString(1 * inch, 10 * inch, "O2 Bottle Management System")
+    p.drawString(1 * inch, 9.5 * inch, "Bill")
+
+    # Draw client details
+    p.drawString(1 * inch, 9 * inch, "Client: " + data["client_name"])
+    p.drawString(1 * inch, 8.5 * inch, "Address: " + data["client_address"])
+    p.drawString(1 * inch, 8 * inch, "Contact: " + data["client_contact"])
+
+    # Draw bill details
+    p.drawString(1 * inch, 7.5 * inch, "Bill Date: " + data["bill_date"])
+    p.drawString(1 * inch, 7 * inch, "Price per Bottle: ₹" + data["price"])
+    p.drawString(1 * inch, 6.5 * inch, "Total Pending Bottles: " + str(data["pending"]))
+    p.drawString(1 * inch, 6 * inch, "Total Amount: ₹" + data["total"])
+
+    # Draw generated by
+    p.drawString(1 * inch, 5.5 * inch, "Generated by: " + data["generated_by"])
+
+    # Save the PDF to the BytesIO buffer.
+    p.save()
+    return buffer.getvalue()
+
+
+def bill_pdf_filename(data):
+    """Download name offered to the browser; also names the bill in ZIP exports, so no path separators"""
+    return get_valid_filename(f"bill_{data['client_name']}_{data['bill_date'].replace('-', '')}.pdf")
+
+
+def bill_fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def cached_pdf_path(data):
+    return os.path.join(settings.BILL_PDF_CACHE_DIR, f"bill_{data['bill_id']}_{bill_fingerprint(data)}.pdf")
+
+
+def get_bill_pdf(bill):
+    """Path to the bill's PDF, rendering and caching it first on a miss"""
+    data = bill_pdf_data(bill)
+    path = cached_pdf_path(data)
+    if not os.path.exists(path):
+        _store(path, render_bill_pdf(data))
+    return path
+
+
+def _store(path, content):
+    """Write atomically so a concurrent reader never sees a half-written file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(content)
+    os.replace(tmp_path, path)
+
+
+def invalidate_bill_pdf(bill_id):
+    """Remove every cached PDF of a bill (any fingerprint)"""
+    for path in glob.glob(os.path.join(settings.BILL_PDF_CACHE_DIR, f"bill_{bill_id}_*.pdf")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def schedule_bill_pdf(bill_id):
+    """Render the bill's PDF in the background worker pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.BILL_PDF_WORKERS, thread_name_prefix='bill-pdf')
+    return _executor.submit(_render_in_background, bill_id)
+
+
+def _render_in_background(bill_id):
+    from .models import Bill
+
+    close_old_connections()
+    try:
+        bill = Bill.objects.select_related('client', 'generated_by').filter(id=bill_id).first()
+        if bill is not None:
+            get_bill_pdf(bill)
+    except Exception:
+        logger.exception('Rendering PDF for bill %s failed', bill_id)
+    finally:
+        connection.close()
+
+
+def _load_or_render(data, cache_dir):
+    """Process pool worker: cached PDF bytes if present, otherwise a fresh render (not stored)"""
+    path = os.path.join(cache_dir, f"bill_{data['bill_id']}_{bill_fingerprint(data)}.pdf")
+    try:
+        with open(path, 'rb') as cached:
+            return cached.read()
+    except FileNotFoundError:
+        return render_bill_pdf(data)
+
+
+class _ZipChunks:
+    """Write-only, unseekable sink for ZipFile; the archive is drained after every member"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_pool():
+    """
+    The process pool that bill ZIP exports render in. There is one per process
+    (per web worker), created on first use and shared by every export that
+    process serves, so a worker never runs more than BILL_EXPORT_PROCESSES
+    render processes however many exports are streaming at once.
+    """
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            _export_pool = ProcessPoolExecutor(max_workers=settings.BILL_EXPORT_PROCESSES)
+        return _export_pool
+
+
+def _discard_export_pool(pool):
+    """Drop a broken shared pool so the next export starts a fresh one"""
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is pool:
+            _export_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_bills_zip(bills, pool=None, processes=None):
+    """
+    Yield a ZIP archive of the bills' PDFs piece by piece.
+
+    PDFs are rendered in `pool` (the shared export_pool() by default) with at
+    most four bills per process in flight, and each one is written to the
+    archive (in bill order) as soon as it is ready, so memory use does not grow
+    with the number of bills. `processes` is the pool's size.
+    """
+    shared = pool is None
+    if shared:
+        pool = export_pool()
+    processes = processes or settings.BILL_EXPORT_PROCESSES
+    sink = _ZipChunks()
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    pending = deque()
+    try:
+        for bill in bills:
+            data = bill_pdf_data(bill)
+            pending.append((data, pool.submit(_load_or_render, data, str(settings.BILL_PDF_CACHE_DIR))))
+            if len(pending) >= processes * 4:
+                yield _add_to_zip(archive, sink, *pending.popleft())
+        while pending:
+            yield _add_to_zip(archive, sink, *pending.popleft())
+    except BrokenProcessPool:
+        if shared:
+            _discard_export_pool(pool)
+        raise
+    finally:
+        # An abandoned download leaves nothing queued for the other exports
+        for _, future in pending:
+            future.cancel()
+    archive.close()
+    yield sink.drain()
+
+
+def _add_to_zip(archive, sink, data, future):
+    name = f"bill_{data['bill_id']}_{bill_pdf_filename(data)[len('bill_'):]}"
+    archive.writestr(name, future.result())
+    return sink.drain()
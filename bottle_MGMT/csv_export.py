@@ -0,0 +1,110 @@
+"""
+Streaming CSV exports.
+
+Rows are produced from querysets read with .iterator(chunk_size=...) and are
+written to the response a few hundred lines at a time, so an export never
+holds the whole result set (or the whole file) in memory.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+class _LineBuffer:
+    """csv.writer target that hands back what was written instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, rows):
+    writer = csv.writer(_LineBuffer())
+    lines = [writer.writerow(header)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= ROWS_PER_WRITE:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def csv_response(filename, header, rows):
+    response = StreamingHttpResponse(iter_csv(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _local(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+TRANSACTION_HEADER = ['id', 'date', 'client_id', 'client', 'type', 'delivered_by', 'billed', 'bottle_count', 'bottle_codes']
+
+
+def transaction_rows(transactions):
+    """Transactions need client/delivered_by selected and bottles prefetched"""
+    for transaction in transactions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        codes = [bottle.code for bottle in transaction.bottles.all()]
+        yield [
+            transaction.id,
+            _local(transaction.date),
+            transaction.client_id,
+            transaction.client.name,
+            transaction.transaction_type,
+            transaction.delivered_by.username if transaction.delivered_by else '',
+            transaction.billed,
+            len(codes),
+            ' '.join(codes),
+        ]
+
+
+BILL_HEADER = [
+    'id', 'bill_date', 'client_id', 'client', 'type', 'delivered', 'returned', 'pending',
+    'price_per_bottle', 'total_amount', 'paid', 'paid_date', 'generated_by',
+]
+
+
+def bill_rows(bills):
+    """Bills need client/generated_by selected"""
+    for bill in bills.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            bill.id,
+            _local(bill.bill_date),
+            bill.client_id,
+            bill.client.name,
+            bill.bill_type,
+            bill.delivered_bottles,
+            bill.returned_bottles,
+            bill.pending_bottles,
+            bill.price_per_bottle,
+            bill.total_amount,
+            bill.paid,
+            _local(bill.paid_date),
+            bill.generated_by.username if bill.generated_by else '',
+        ]
+
+
+BALANCE_HEADER = [
+    'client_id', 'client', 'contact', 'delivered', 'returned', 'pending',
+    'unbilled_delivered', 'unbilled_returned', 'unbilled_pending',
+]
+
+
+def balance_rows(clients):
+    """Clients need the annotate_client_stats annotations"""
+    for client in clients.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            client.id,
+            client.name,
+            client.contact,
+            client.delivered,
+            client.returned,
+            client.pending,
+            client.unbilled_delivered,
+            client.unbilled_returned,
+            client.unbilled_pending,
+        ]
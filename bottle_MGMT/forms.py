@@ -1,5 +1,10 @@
+import re
+
 from django import forms
+from django.db import models
+from django.urls import reverse_lazy
 from .models import Client, Transaction, Bottle, BottlePricing, BottleCategory
+from .utils import format_code_ranges
 
 class AddBottlesForm(forms.Form):
     series = forms.CharField(label='Series Prefix', max_length=5, help_text='e.g. SV or AV')
@@ -11,6 +16,13 @@ class AddBottlesForm(forms.Form):
         empty_label="Select a Category"
     )
     
+    def clean_series(self):
+        series = self.cleaned_data['series'].strip().upper()
+        # The codes this series makes must parse back to it, or they could not be found by series
+        if Bottle.parse_code(f'{series}-1')[0] != series:
+            raise forms.ValidationError('Series must start with a letter and contain only letters and digits.')
+        return series
+
     def clean(self):
         cleaned_data = super().clean()
         start = cleaned_data.get('start')
@@ -38,10 +50,177 @@ class AdminProfileForm(forms.ModelForm):
         if not contact.isdigit() or len(contact) != 10:
             raise forms.ValidationError('Contact number must be exactly 10 digits.')
         return contact
+MAX_TRANSACTION_PHOTOS = 10
+MAX_BOTTLES_PER_TRANSACTION = 1000
+
+# Status a bottle must currently have to be delivered / returned
+REQUIRED_BOTTLE_STATUS = {
+    'delivered': 'in_stock',
+    'returned': 'delivered',
+}
+
+
+def parse_bottle_selection(value):
+    """
+    Parse a bottle selection like "SV-101..SV-150, AV-7" into terms:
+    ('range', series, first, last), ('code', series, number) or ('raw', code).
+    Entries are separated by commas, semicolons or new lines (one per scan);
+    an entry that is not a range or a single code may hold several space-separated codes.
+    """
+    terms = []
+    for entry in re.split(r'[,;\n]+', value or ''):
+        entry = entry.strip()
+        if not entry:
+            continue
+        # A single code first: "O2-101" is one bottle, not the range O-2..O-101
+        match = Bottle.CODE_RANGE_RE.match(entry) if Bottle.parse_code(entry)[1] is None else None
+        if match:
+            first, last = sorted((int(match.group(2)), int(match.group(3))))
+            terms.append(('range', match.group(1).upper(), first, last))
+            continue
+        for code in [entry] if Bottle.parse_code(entry)[1] is not None else entry.split():
+            series, number = Bottle.parse_code(code)
+            if number is None:
+                terms.append(('raw', code.upper()))
+            else:
+                terms.append(('code', series, number))
+    return terms
+
+
+def merge_ranges(ranges):
+    """{series: [(first, last), ...]} with overlapping and adjacent (series, first, last) ranges joined"""
+    spans = {}
+    for series, first, last in sorted(ranges):
+        merged = spans.setdefault(series, [])
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return spans
+
+
+def resolve_bottle_selection(terms, required_status=None):
+    """
+    Look up every bottle a parsed selection names with one query on (series, number).
+    Returns (bottle_ids in code order, error messages).
+    """
+    ranges = [term[1:] for term in terms if term[0] == 'range']
+    codes = {term[1:] for term in terms if term[0] == 'code'}
+    raw_codes = {term[1] for term in terms if term[0] == 'raw'}
+    # Count the selection from the range bounds before expanding anything, so a typo
+    # like "SV 1-20000000" is turned away without building a set of its numbers
+    spans = merge_ranges(ranges)
+    singles = {}    # series -> numbers outside every range
+    for series, number in codes:
+        if not any(first <= number <= last for first, last in spans.get(series, ())):
+            singles.setdefault(series, set()).add(number)
+    selected = sum(last - first + 1 for merged in spans.values() for first, last in merged)
+    if selected + sum(map(len, singles.values())) + len(raw_codes) > MAX_BOTTLES_PER_TRANSACTION:
+        return [], [f'Select at most {MAX_BOTTLES_PER_TRANSACTION} bottles per transaction.']
+
+    # Under the limit, so the ranges can be expanded: series -> set of numbers
+    wanted = {series: set(numbers) for series, numbers in singles.items()}
+    condition = models.Q(code__in=raw_codes) if raw_codes else models.Q()
+    for series, merged in spans.items():
+        for first, last in merged:
+            wanted.setdefault(series, set()).update(range(first, last + 1))
+            condition |= models.Q(series=series, number__range=(first, last))
+    for series, numbers in singles.items():
+        condition |= models.Q(series=series, number__in=numbers)
+    if not condition:
+        return [], []
+
+    found = {}
+    wrong_status = {}   # series -> numbers (unparsed codes are listed under their own code)
+    for bottle_id, code, series, number, status in Bottle.objects.filter(condition).order_by(
+        *Bottle.CODE_ORDER
+    ).values_list('id', 'code', 'series', 'number', 'status'):
+        found[(series, number) if number is not None else code] = bottle_id
+        if required_status and status != required_status:
+            wrong_status.setdefault(series if number is not None else code, []).append(number)
+
+    errors = []
+    for series, numbers in sorted(wanted.items()):
+        missing = [number for number in numbers if (series, number) not in found]
+        if missing:
+            errors.append(f'Unknown bottles: {format_code_ranges(series, missing)}.')
+    missing_raw = sorted(raw_codes.difference(found))
+    if missing_raw:
+        errors.append(f'Unknown bottles: {", ".join(missing_raw)}.')
+    if wrong_status:
+        wrong = [
+            format_code_ranges(key, numbers) if numbers[0] is not None else key
+            for key, numbers in wrong_status.items()
+        ]
+        errors.append(f'Not {required_status.replace("_", " ")}: {", ".join(wrong)}.')
+    return list(found.values()), errors
+
+
+class BottleSelectionField(forms.CharField):
+    """Bottle codes, ranges and scanned lists as text; cleans to parsed terms"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', forms.Textarea(attrs={
+            'rows': 3,
+            'placeholder': 'SV-101..SV-150, AV-7 (or scan one code per line)',
+        }))
+        kwargs.setdefault('help_text', 'Codes and ranges separated by commas or new lines, e.g. SV-101..SV-150, SV 200-210, AV-7')
+        super().__init__(*args, **kwargs)
+
+    def clean(self, value):
+        terms = parse_bottle_selection(super().clean(value))
+        if self.required and not terms:
+            raise forms.ValidationError(self.error_messages['required'], code='required')
+        return terms
+
+
+class MultipleImageInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    """An ImageField that accepts several files and validates each one"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleImageInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if not data:
+            if self.required:
+                raise forms.ValidationError(self.error_messages['required'], code='required')
+            return []
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+        if len(data) > MAX_TRANSACTION_PHOTOS:
+            raise forms.ValidationError(f'Upload at most {MAX_TRANSACTION_PHOTOS} photos.')
+        return [super(MultipleImageField, self).clean(upload, initial) for upload in data]
+
+
+def use_client_typeahead(form, field_name='client'):
+    """
+    Make a client field a search-as-you-type picker (partials/client_typeahead_js.html):
+    only the chosen client is rendered as an option, not every client.
+    """
+    selected_client = form.data.get(form.add_prefix(field_name)) or form.initial.get(field_name)
+    client_field = form.fields[field_name]
+    client_field.widget.attrs.update({'class': 'client-typeahead', 'data-typeahead-url': reverse_lazy('client_typeahead')})
+    choices = [('', client_field.empty_label)]
+    if str(selected_client or '').isdigit():
+        choices += [
+            (client.pk, client_field.label_from_instance(client))
+            for client in Client.objects.filter(pk=selected_client)
+        ]
+    client_field.widget.choices = choices
+
+
 class TransactionForm(forms.ModelForm):
+    bottles = BottleSelectionField()
+    photos = MultipleImageField(required=False)
+
     class Meta:
         model = Transaction
-        fields = ['client', 'bottles', 'transaction_type', 'custom_date']
+        fields = ['client', 'transaction_type', 'custom_date']
         widgets = {
             'custom_date': forms.DateTimeInput(attrs={
                 'type': 'datetime-local',
@@ -53,16 +232,20 @@ class TransactionForm(forms.ModelForm):
         transaction_type = kwargs.pop('transaction_type', None)
         super().__init__(*args, **kwargs)
         
+        use_client_typeahead(self)
+
         # Make custom_date optional
         self.fields['custom_date'].required = False
         self.fields['custom_date'].help_text = "Optional: Leave blank to use current date/time"
         
-        if transaction_type == 'delivered':
-            self.fields['bottles'].queryset = Bottle.objects.filter(status='in_stock')
-        elif transaction_type == 'returned':
-            self.fields['bottles'].queryset = Bottle.objects.filter(status='delivered')
-        else:
-            self.fields['bottles'].queryset = Bottle.objects.all()
+        self.required_bottle_status = REQUIRED_BOTTLE_STATUS.get(transaction_type)
+
+    def clean_bottles(self):
+        """Resolve the selection to bottle ids (one query), checking each bottle can be moved"""
+        bottle_ids, errors = resolve_bottle_selection(self.cleaned_data['bottles'], self.required_bottle_status)
+        if errors:
+            raise forms.ValidationError(errors)
+        return bottle_ids
 
 class BottlePricingForm(forms.ModelForm):
     class Meta:
@@ -73,4 +256,67 @@ class BottlePricingForm(forms.ModelForm):
 class BottleCategoryForm(forms.ModelForm):
     class Meta:
         model = BottleCategory
-        fields = ['name']
\ No newline at end of file
+        fields = ['name']
+
+
+class DeliveryRunStopForm(forms.Form):
+    """One client stop on a delivery run: bottles dropped off and bottles collected"""
+    client = forms.ModelChoiceField(queryset=Client.objects.all(), required=False)
+    # Same codes, ranges and scans the transaction form takes
+    delivered_codes = BottleSelectionField(
+        required=False,
+        label='Delivered',
+        widget=forms.TextInput(attrs={'placeholder': 'SV-101..SV-105, SV-110'}),
+    )
+    returned_codes = BottleSelectionField(
+        required=False,
+        label='Returned',
+        widget=forms.TextInput(attrs={'placeholder': 'SV-90'}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        use_client_typeahead(self)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        has_codes = cleaned_data.get('delivered_codes') or cleaned_data.get('returned_codes')
+        if has_codes and not cleaned_data.get('client'):
+            self.add_error('client', 'Select the client for this stop.')
+        return cleaned_data
+
+
+class BaseDeliveryRunFormSet(forms.BaseFormSet):
+    """
+    Resolves each stop's bottles with resolve_bottle_selection (one query per filled-in
+    field) and rejects a bottle that appears more than once on the run.
+    """
+
+    REQUIRED_STATUS = REQUIRED_BOTTLE_STATUS
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+
+        seen = set()
+        for form in self.forms:
+            for transaction_type, required_status in self.REQUIRED_STATUS.items():
+                field = f'{transaction_type}_codes'
+                terms = form.cleaned_data.get(field)
+                bottle_ids, errors = resolve_bottle_selection(terms, required_status) if terms else ([], [])
+                repeated = seen.intersection(bottle_ids)
+                seen.update(bottle_ids)
+                if repeated:
+                    codes = Bottle.objects.filter(id__in=repeated).order_by(*Bottle.CODE_ORDER).values_list('code', flat=True)
+                    errors.append(f'{", ".join(codes)} already on this run.')
+                for error in errors:
+                    form.add_error(field, error)
+                form.cleaned_data[f'{transaction_type}_bottle_ids'] = bottle_ids
+
+
+DeliveryRunFormSet = forms.formset_factory(
+    DeliveryRunStopForm,
+    formset=BaseDeliveryRunFormSet,
+    extra=10,
+)
@@ -0,0 +1,83 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from bottle_MGMT.models import TransactionPhoto
+from bottle_MGMT.photo_variants import build_variants
+
+
+class Command(BaseCommand):
+    help = 'Build thumbnail and web-sized variants for transaction photos that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild variants for every photo, not only the missing ones',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Threads resizing images in parallel (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Photos saved per bulk update (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        photos = TransactionPhoto.objects.exclude(image='').order_by('id')
+        if not options['force']:
+            photos = photos.filter(thumbnail='')
+
+        started = time.monotonic()
+        built = failed = 0
+        # Resizing runs in worker threads (Pillow releases the GIL); the database writes stay here
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            batch = []
+            photo_rows = photos.iterator(chunk_size=options['batch_size'])
+            for photo, error in self._build_all(pool, photo_rows, window=options['workers'] * 4):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Photo {photo.id} ({photo.image.name}): {error}")
+                    continue
+                batch.append(photo)
+                if len(batch) >= options['batch_size']:
+                    built += self._save(batch)
+                    batch = []
+            built += self._save(batch)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} photo(s) in {elapsed:.2f}s, {failed} failed."))
+
+    def _build_all(self, pool, photos, window):
+        """
+        (photo, error) for each photo, in order. At most window photos are in flight, so a
+        large backfill never holds every photo and future in memory (Executor.map would
+        submit them all up front).
+        """
+        pending = deque()
+        for photo in photos:
+            pending.append(pool.submit(self._build, photo))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    @staticmethod
+    def _build(photo):
+        try:
+            build_variants(photo)
+        except Exception as error:
+            return photo, error
+        return photo, None
+
+    @staticmethod
+    def _save(photos):
+        TransactionPhoto.objects.bulk_update(photos, ['thumbnail', 'web_image'])
+        return len(photos)
@@ -0,0 +1,266 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import ExitStack, nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client as TestClient
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from bottle_MGMT.bench_data import EXPECTED_STATUS, benchmark_urls, benchmark_user, sample_params, seed_bench_data
+from bottle_MGMT.middleware import QueryRecorder
+from bottle_MGMT.models import Bill, Client, Transaction, TransactionPhoto
+
+# (clients, bottles, transactions) per named size
+SIZES = {
+    'small': (50, 500, 2000),
+    'medium': (250, 2500, 10000),
+    'large': (1000, 10000, 50000),
+}
+# A median this much slower than the baseline (and at least REGRESSION_MIN_MS slower) is a regression
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_MS = 2.0
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every URL in the project at several seeded data sizes and write a JSON and markdown report. '
+        'Each size is seeded inside a transaction that is rolled back, so the database is left unchanged.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='small,medium',
+            help=(
+                f"Comma-separated sizes: {', '.join(SIZES)}, CLIENTS:BOTTLES:TRANSACTIONS, "
+                "or 'current' for the data already in the database (default: small,medium)"
+            ),
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per URL after one warm-up (default: 5)')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the generated data (default: 1)')
+        parser.add_argument('--output-dir', default='benchmark_reports', help='Where to write the reports (default: benchmark_reports)')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help=(
+                'Exit with an error if any URL returns an unexpected status, '
+                'or got slower or runs more queries than in --baseline'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        self.verbosity = options['verbosity']
+        sizes = [self.parse_size(name.strip()) for name in options['sizes'].split(',') if name.strip()]
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'database': connections['default'].vendor,
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'sizes': [],
+        }
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as scratch:
+            # Rendered PDFs, seeded photos and cached inventory counts go to scratch space,
+            # not the real media and cache directories
+            scratch_settings = override_settings(
+                BILL_PDF_CACHE_DIR=os.path.join(scratch, 'bill_pdfs'),
+                CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': os.path.join(scratch, 'cache'),
+                }},
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            )
+            with scratch_settings:
+                for name, dimensions in sizes:
+                    self.stdout.write(f"Benchmarking size {name}...")
+                    media_settings = override_settings(MEDIA_ROOT=scratch) if dimensions else nullcontext()
+                    with media_settings:
+                        report['sizes'].append(self.run_size(name, dimensions, options))
+
+        failures = status_failures(report)
+        regressions = compare_reports(baseline, report) if baseline else []
+        os.makedirs(options['output_dir'], exist_ok=True)
+        stem = os.path.join(options['output_dir'], f"benchmark_{timezone.localtime().strftime('%Y%m%d-%H%M%S')}")
+        with open(f'{stem}.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        with open(f'{stem}.md', 'w') as f:
+            f.write(markdown_report(report, failures, regressions, options['baseline']))
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {stem}.json and {stem}.md"))
+        for line in failures:
+            self.stdout.write(self.style.ERROR(f"Failed: {line}"))
+        for line in regressions:
+            self.stdout.write(self.style.WARNING(f"Regression: {line}"))
+        if (failures or regressions) and options['fail_on_regression']:
+            problems = [f"{len(failures)} failed request(s)"] if failures else []
+            if regressions:
+                problems.append(f"{len(regressions)} regression(s) against {options['baseline']}")
+            raise CommandError(' and '.join(problems) + '.')
+
+    @staticmethod
+    def parse_size(name):
+        if name == 'current':
+            return name, None
+        if name in SIZES:
+            return name, SIZES[name]
+        try:
+            clients, bottles, transactions = (int(part) for part in name.split(':'))
+        except ValueError:
+            raise CommandError(f"Unknown size {name!r}; use {', '.join(SIZES)}, current or CLIENTS:BOTTLES:TRANSACTIONS.")
+        return name, (clients, bottles, transactions)
+
+    def run_size(self, name, dimensions, options):
+        result = {'name': name}
+        with transaction.atomic():
+            # The views only let the default admin in; it also delivers the seeded
+            # transactions, so the delivery dashboard has rows to show
+            user = benchmark_user()
+            if dimensions:
+                started = time.monotonic()
+                try:
+                    result['rows'] = seed_bench_data(*dimensions, seed=options['seed'], drivers=[user])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                result['seed_seconds'] = round(time.monotonic() - started, 2)
+            else:
+                result['rows'] = {
+                    'clients': Client.objects.count(),
+                    'transactions': Transaction.objects.count(),
+                    'bills': Bill.objects.count(),
+                    'photos': TransactionPhoto.objects.count(),
+                }
+
+            # Server errors are recorded as a 500 status and reported as failures instead of stopping the run
+            client = TestClient(raise_request_exception=False)
+            client.force_login(user)
+            result['results'] = [
+                self.time_request(client, url_name, label, url, options['repeat'])
+                for url_name, label, url in benchmark_urls(sample_params(bool(dimensions)))
+            ]
+            # Leave the database exactly as it was
+            transaction.set_rollback(True)
+        return result
+
+    def time_request(self, client, url_name, label, url, repeat):
+        timings, db_timings = [], []
+        for run in range(repeat + 1):
+            recorder = QueryRecorder()
+            # Each request runs in a savepoint that is rolled back, so views that write
+            # (generate_bill bills the client on GET) see the same data every time
+            with transaction.atomic(), ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                started = time.perf_counter()
+                response = client.get(url)
+                size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            if run:
+                # The first request warms caches and is not counted
+                timings.append(elapsed * 1000)
+                db_timings.append(sum(duration for _, duration in recorder.queries) * 1000)
+        if self.verbosity > 1:
+            self.stdout.write(f"  {url}: {statistics.median(timings):.1f} ms, {len(recorder.queries)} queries")
+        return {
+            'url_name': url_name,
+            'label': label,
+            'url': url,
+            'status': response.status_code,
+            'expected_status': EXPECTED_STATUS.get(url_name, 200),
+            'queries': len(recorder.queries),
+            'bytes': size,
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'db_median_ms': round(statistics.median(db_timings), 2),
+        }
+
+
+def status_failures(report):
+    """Lines describing every URL that returned something other than its expected status"""
+    return [
+        f"[{size['name']}] {result['label']}: status {result['status']}, expected {result['expected_status']}"
+        for size in report['sizes']
+        for result in size['results']
+        if result['status'] != result['expected_status']
+    ]
+
+
+def compare_reports(baseline, report):
+    """Lines describing every URL that got slower or runs more queries than in the baseline"""
+    previous = {
+        (size['name'], result['label']): result
+        for size in baseline.get('sizes', [])
+        for result in size.get('results', [])
+    }
+    regressions = []
+    for size in report['sizes']:
+        for result in size['results']:
+            before = previous.get((size['name'], result['label']))
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f"[{size['name']}] {result['label']}: {before['queries']} -> {result['queries']} queries")
+            slower = result['median_ms'] - before['median_ms']
+            if result['median_ms'] > before['median_ms'] * REGRESSION_RATIO and slower >= REGRESSION_MIN_MS:
+                regressions.append(
+                    f"[{size['name']}] {result['label']}: median {before['median_ms']} -> {result['median_ms']} ms"
+                )
+    return regressions
+
+
+def markdown_report(report, failures, regressions, baseline_path):
+    sizes = report['sizes']
+    lines = [
+        '# View benchmark',
+        '',
+        f"Generated {report['generated_at']} on {report['database']}, seed {report['seed']}. "
+        f"Each URL gets one warm-up request, then {report['repeat']} timed requests; medians are shown.",
+        '',
+        '## Data sizes',
+        '',
+        '| Size | Clients | Bottles | Transactions | Bills | Photos | Seed time (s) |',
+        '| --- | ---: | ---: | ---: | ---: | ---: | ---: |',
+    ]
+    for size in sizes:
+        rows = size['rows']
+        lines.append(
+            f"| {size['name']} | {rows.get('clients', '')} | {rows.get('bottles', '')} | {rows.get('transactions', '')} "
+            f"| {rows.get('bills', '')} | {rows.get('photos', '')} | {size.get('seed_seconds', '')} |"
+        )
+
+    header = '| Route |' + ''.join(f" {size['name']} ms | {size['name']} queries |" for size in sizes)
+    lines += ['', '## Results', '', header, '| --- |' + ' ---: | ---: |' * len(sizes)]
+    labels = list(dict.fromkeys(result['label'] for size in sizes for result in size['results']))
+    by_size = [{result['label']: result for result in size['results']} for size in sizes]
+    for label in labels:
+        cells = []
+        for results in by_size:
+            result = results.get(label)
+            if result is None:
+                cells += ['', '']
+                continue
+            status = '' if result['status'] == 200 else f" ({result['status']})"
+            cells += [f"{result['median_ms']}{status}", str(result['queries'])]
+        lines.append(f'| `{label}` | ' + ' | '.join(cells) + ' |')
+
+    if failures:
+        lines += ['', '## Failed requests', '']
+        lines += [f'- {line}' for line in failures]
+    if baseline_path:
+        lines += ['', f'## Regressions against {baseline_path}', '']
+        lines += [f'- {line}' for line in regressions] or ['None.']
+    return '\n'.join(lines) + '\n'
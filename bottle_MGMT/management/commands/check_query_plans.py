@@ -0,0 +1,138 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bottle_MGMT.models import (
+    Bill, Bottle, BottleCategory, BottleMovement, Client, ClientBottleBalance, DailySalesRollup, Transaction,
+)
+
+# "SCAN <table>" with no index after it is a full table scan in EXPLAIN QUERY PLAN output
+FULL_SCAN_RE = re.compile(r'\bSCAN (\S+)(.*)$')
+
+
+def hot_queries(client_id, user_id):
+    """(label, queryset) for the lookups the views run on every request"""
+    now = timezone.now()
+    return [
+        ('unbilled transactions for a client (generate_bill)',
+         Transaction.objects.filter(client_id=client_id, billed=False)),
+        ('client transactions by type and billed (create_custom_bill)',
+         Transaction.objects.filter(client_id=client_id, transaction_type='delivered', billed=False)),
+        ('client history newest first (custom_billing_view)',
+         Transaction.objects.filter(client_id=client_id).order_by('-date')),
+        ('delivery user transactions (transaction_list, delivery_dashboard)',
+         Transaction.objects.filter(delivered_by_id=user_id).order_by('-date', '-id')[:51]),
+        ('transaction list keyset page (transaction_list)',
+         Transaction.objects.filter(Q(date__lt=now) | Q(date=now, id__lt=1000)).order_by('-date', '-id')[:51]),
+        ('bill history for a client (bill_history)',
+         Bill.objects.filter(client_id=client_id)),
+        ('custom bills for a client (client stats)',
+         Bill.objects.filter(client_id=client_id, bill_type='custom')),
+        ('recent bills (sales_analytics)',
+         Bill.objects.order_by('-bill_date')[:10]),
+        ('bottles available for delivery (TransactionForm)',
+         Bottle.objects.filter(status='in_stock').order_by(*Bottle.CODE_ORDER)),
+        ('bottle code range in numeric order (inventory_view)',
+         Bottle.objects.filter(Bottle.code_filter('QP 100-250')).order_by(*Bottle.CODE_ORDER)),
+        ('bottle code range with a status (inventory_view)',
+         Bottle.objects.filter(Bottle.code_filter('QP 100-250'), status='in_stock').order_by(*Bottle.CODE_ORDER)),
+        ('client bottle balance (generate_bill)',
+         ClientBottleBalance.objects.filter(client_id=client_id)),
+        ('movement history of a bottle (bottle_photos_view)',
+         BottleMovement.objects.filter(bottle_id=1).order_by('-date', '-id')),
+        ('sales rollup for a date window (sales_analytics)',
+         DailySalesRollup.objects.filter(date__range=[now.date() - timedelta(days=30), now.date()])),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN on the hot view queries against a temporarily seeded database '
+        'and fail if any of them falls back to a full table scan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000,
+            help='Transactions to seed before explaining (rolled back afterwards, default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans understands SQLite query plans only.')
+
+        failures = []
+        with transaction.atomic():
+            client_id, user_id = self.seed(options['rows'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for label, queryset in hot_queries(client_id, user_id):
+                plan = queryset.explain()
+                scans = []
+                for line in plan.splitlines():
+                    match = FULL_SCAN_RE.search(line)
+                    if match and 'INDEX' not in match.group(2):
+                        scans.append(match.group(1))
+                if scans:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}: {', '.join(scans)}"))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(f"ok         {label}")
+
+            # Leave the database exactly as it was
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a full table scan.")
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
+
+    def seed(self, rows):
+        """Insert a realistic spread of rows so the planner has statistics to work with"""
+        user = User.objects.create(username='query-plan-check')
+        category = BottleCategory.objects.create(name='query-plan-check')
+        clients = Client.objects.bulk_create([
+            Client(name=f'Plan check {i}', contact='0000000000', email='plan@example.com', address='-')
+            for i in range(max(rows // 40, 1))
+        ])
+        Bottle.objects.bulk_create([
+            Bottle(code=f'QP-{i}', status=('in_stock', 'delivered')[i % 2], category=category)
+            for i in range(rows)
+        ])
+        now = timezone.now()
+        Transaction.objects.bulk_create([
+            Transaction(
+                client=clients[i % len(clients)],
+                date=now - timedelta(hours=i),
+                delivered_by=user,
+                transaction_type=('delivered', 'returned')[i % 2],
+                billed=i % 3 == 0,
+            )
+            for i in range(rows)
+        ])
+        Bill.objects.bulk_create([
+            Bill(
+                client=clients[i % len(clients)],
+                delivered_bottles=1,
+                returned_bottles=0,
+                pending_bottles=1,
+                total_amount=Decimal('100.00'),
+                bill_type=('auto', 'custom')[i % 2],
+            )
+            for i in range(max(rows // 10, 1))
+        ])
+        ClientBottleBalance.objects.bulk_create([ClientBottleBalance(client=client) for client in clients])
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(date=(now - timedelta(days=i % 365)).date(), client=client)
+            for i, client in enumerate(clients)
+        ])
+        return clients[0].id, user.id
@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bottle_MGMT.bill_pdf import iter_bills_zip
+from bottle_MGMT.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Write a ZIP of every bill PDF in a date range, rendering the PDFs in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', type=date.fromisoformat, help='First bill date (YYYY-MM-DD)')
+        parser.add_argument('end', type=date.fromisoformat, help='Last bill date, inclusive (YYYY-MM-DD)')
+        parser.add_argument('output', help='Path of the ZIP file to write')
+        parser.add_argument('--client', type=int, help='Only export bills of this client id')
+        parser.add_argument(
+            '--status',
+            choices=['paid', 'unpaid'],
+            help='Only export paid or unpaid bills',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help='Rendering processes (default: BILL_EXPORT_PROCESSES)',
+        )
+
+    def handle(self, *args, **options):
+        if options['start'] > options['end']:
+            raise CommandError('start must not be after end.')
+
+        paid = None if options['status'] is None else options['status'] == 'paid'
+        bills = Bill.in_date_range(options['start'], options['end'], client_id=options['client'], paid=paid)
+        count = bills.count()
+
+        started = time.monotonic()
+        processes = options['processes'] or settings.BILL_EXPORT_PROCESSES
+        # A one-off run gets its own pool sized by --processes rather than the shared export pool
+        with ProcessPoolExecutor(max_workers=processes) as pool, open(options['output'], 'wb') as output:
+            for chunk in iter_bills_zip(bills.iterator(chunk_size=500), pool=pool, processes=processes):
+                output.write(chunk)
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} bill PDF(s) to {options['output']} in {elapsed:.2f}s ({count / elapsed:.1f} bills/s)."
+        ))
@@ -0,0 +1,116 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bottle_MGMT.models import TransactionPhoto
+from bottle_MGMT.storage import is_content_addressed, photo_storage
+
+PHOTO_FIELDS = ('image', 'thumbnail', 'web_image')
+PHOTO_ROOT = 'bottle_photos'
+
+
+class Command(BaseCommand):
+    help = 'Move transaction photos to content-addressed storage, dropping duplicate copies, and report the bytes saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would move and how much space would be saved without changing anything',
+        )
+        parser.add_argument(
+            '--delete-orphans',
+            action='store_true',
+            help=f'Also delete files under {PHOTO_ROOT}/ that no photo references (run when no uploads are in progress)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Photos updated per database transaction (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        storage = photo_storage()
+        dry_run = options['dry_run']
+        self.written = set()
+        self.bytes_written = 0
+        moved_names = set()
+        missing = 0
+
+        photos = TransactionPhoto.objects.order_by('id').iterator(chunk_size=options['batch_size'])
+        batch = []
+        for photo in photos:
+            changed = False
+            for field in PHOTO_FIELDS:
+                name = getattr(photo, field).name
+                if not name or is_content_addressed(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f"Photo {photo.id}: {field} file {name} is missing, left as is")
+                    continue
+                setattr(photo, field, self._rehome(storage, name, dry_run))
+                moved_names.add(name)
+                changed = True
+            if changed:
+                batch.append(photo)
+            if len(batch) >= options['batch_size']:
+                self._save(batch, dry_run)
+                batch = []
+        self._save(batch, dry_run)
+
+        # Old names are only removed once no row points at them any more
+        removable = set(moved_names)
+        if options['delete_orphans']:
+            removable |= set(self._stored_names(storage, PHOTO_ROOT)) - self.written
+        referenced = self._referenced_names()
+        if dry_run:
+            # The rows still hold the names this run would have replaced
+            referenced -= moved_names
+        removable -= referenced
+        bytes_removed = 0
+        for name in sorted(removable):
+            bytes_removed += storage.size(name)
+            if not dry_run:
+                storage.delete(name)
+
+        saved = bytes_removed - self.bytes_written
+        prefix = 'Dry run: would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {len(moved_names)} file(s) into {len(self.written)} content-addressed file(s); "
+            f"removed {len(removable)} file(s) ({bytes_removed} bytes), wrote {self.bytes_written} bytes, "
+            f"saved {saved} bytes ({saved / 1048576:.1f} MiB)."
+        ))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} referenced file(s) were missing."))
+
+    def _rehome(self, storage, name, dry_run):
+        with storage.open(name, 'rb') as content:
+            target = storage.content_name(name, content)
+            if target not in self.written and not storage.exists(target):
+                self.bytes_written += storage.size(name)
+            if not dry_run:
+                target = storage.save(name, content)
+        self.written.add(target)
+        return target
+
+    @staticmethod
+    def _save(photos, dry_run):
+        if photos and not dry_run:
+            with transaction.atomic():
+                TransactionPhoto.objects.bulk_update(photos, PHOTO_FIELDS)
+
+    @staticmethod
+    def _referenced_names():
+        referenced = set()
+        for names in TransactionPhoto.objects.values_list(*PHOTO_FIELDS).iterator():
+            referenced.update(name for name in names if name)
+        return referenced
+
+    @staticmethod
+    def _stored_names(storage, root):
+        for directory, _, filenames in os.walk(storage.path(root)):
+            for filename in filenames:
+                yield os.path.relpath(os.path.join(directory, filename), storage.location).replace(os.sep, '/')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bottle_MGMT.models import Client, ClientBottleBalance
+
+
+class Command(BaseCommand):
+    help = 'Recompute every client bottle balance from transaction history and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report drifted balances; exit with an error if any are found',
+        )
+        parser.add_argument(
+            '--client',
+            type=int,
+            action='append',
+            dest='client_ids',
+            help='Limit the rebuild to this client id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+        clients = None
+        if options['client_ids']:
+            clients = Client.objects.filter(id__in=options['client_ids'])
+
+        with transaction.atomic():
+            drift = ClientBottleBalance.rebuild(clients, dry_run=verify)
+
+        for client_id, stored, expected in sorted(drift):
+            self.stdout.write(f"Client {client_id}: stored {stored}, expected {expected}")
+
+        if verify and drift:
+            raise CommandError(f"{len(drift)} client balance(s) have drifted from transaction history.")
+        if verify:
+            self.stdout.write(self.style.SUCCESS('All client balances match transaction history.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} client balance(s)."))
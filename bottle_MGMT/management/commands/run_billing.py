@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from bottle_MGMT.models import Bill, BottlePricing, ClientBottleBalance
+
+
+class Command(BaseCommand):
+    help = 'Generate auto bills for every client with unbilled transactions, one atomic transaction per chunk of clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Clients billed per database transaction (default: 200)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be billed without writing anything',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as generated_by on the new bills',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        generated_by = None
+        if options['user']:
+            generated_by = User.objects.filter(username=options['user']).first()
+            if generated_by is None:
+                raise CommandError(f"User {options['user']!r} does not exist.")
+
+        dry_run = options['dry_run']
+        price = BottlePricing.get_solo().price
+        pending = ClientBottleBalance.objects.filter(
+            Q(unbilled_delivered__gt=0) | Q(unbilled_returned__gt=0)
+        ).order_by('client_id')
+
+        started = time.monotonic()
+        clients = bills = 0
+        total = 0
+        last_client_id = 0
+        while True:
+            # Keyset over client ids so each chunk is a short indexed read
+            with transaction.atomic():
+                chunk = list(pending.filter(client_id__gt=last_client_id)[:chunk_size])
+                if not chunk:
+                    break
+                if dry_run:
+                    total += sum(balance.unbilled_pending * price for balance in chunk)
+                else:
+                    # Billed from the ledger as it stands once the bills hold the write lock. Each
+                    # bill's PDF is queued when its chunk commits; the command exits once they are rendered
+                    new_bills = Bill.create_auto_bills(
+                        [balance.client_id for balance in chunk], price, generated_by=generated_by,
+                    )
+                    bills += len(new_bills)
+                    total += sum(bill.total_amount for bill in new_bills)
+            last_client_id = chunk[-1].client_id
+            clients += len(chunk)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Chunk ending at client {last_client_id}: {len(chunk)} client(s)")
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run: {clients} client(s) would be billed for {total} at {price} per bottle."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Generated {bills} bill(s) for {clients} client(s), total {total}."
+            ))
+        self.stdout.write(
+            f"{elapsed:.2f}s, {clients / elapsed:.1f} clients/s, {bills / elapsed:.1f} bills/s"
+        )
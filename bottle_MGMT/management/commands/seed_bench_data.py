@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from bottle_MGMT.bench_data import BENCH_DRIVER, seed_bench_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with reproducible benchmark data: clients, bottles across categories, '
+        'a year of delivery and return transactions, monthly bills and photos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='Clients to create (default: 200)')
+        parser.add_argument('--bottles', type=int, default=2000, help='Bottles to create (default: 2000)')
+        parser.add_argument('--transactions', type=int, default=10000, help='Transactions to simulate (default: 10000)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; the same seed gives the same data (default: 1)')
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread transactions over (default: 365)')
+        parser.add_argument(
+            '--photo-ratio',
+            type=float,
+            default=0.2,
+            help='Share of transactions that get one to three photos (default: 0.2)',
+        )
+        parser.add_argument(
+            '--paid-ratio',
+            type=float,
+            default=0.7,
+            help='Share of generated bills marked paid (default: 0.7)',
+        )
+        parser.add_argument(
+            '--driver',
+            help=f'Username that delivers the transactions and generates the bills (default: {BENCH_DRIVER}, created if missing)',
+        )
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['bottles'] < 1 or options['days'] < 1:
+            raise CommandError('--clients, --bottles and --days must be at least 1.')
+
+        drivers = None
+        if options['driver']:
+            try:
+                drivers = [User.objects.get(username=options['driver'])]
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['driver']!r}.")
+
+        started = time.monotonic()
+        try:
+            counts = seed_bench_data(
+                options['clients'],
+                options['bottles'],
+                options['transactions'],
+                seed=options['seed'],
+                days=options['days'],
+                photo_ratio=options['photo_ratio'],
+                paid_ratio=options['paid_ratio'],
+                drivers=drivers,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        summary = ', '.join(f'{count} {label}' for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary} in {time.monotonic() - started:.1f}s (seed {options['seed']})."
+        ))
@@ -0,0 +1,99 @@
+"""
+Helpers for serving uploaded media (photos, UPI QR codes) from serve_media.
+
+Files are validated and stat'ed in Python, but their bytes can be handed off
+to the front-end server with X-Sendfile or X-Accel-Redirect (MEDIA_SENDFILE).
+Content-addressed photos never change under their name, so they get an
+immutable, year-long Cache-Control and their hash as ETag. Client photos and
+UPI QR codes are only for logged-in users, so every response is marked
+private: browsers may keep them, shared caches and proxies must not.
+"""
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import Http404
+from django.utils._os import safe_join
+from django.utils.http import http_date, quote_etag
+
+from .storage import content_hash_from_name
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'private, max-age=3600'
+RANGE_CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_file(path):
+    """(relative path, absolute path, stat) for a servable media file, or Http404"""
+    path = posixpath.normpath(path).lstrip('/')
+    # MEDIA_ROOT is the project directory, so only the upload directories are servable
+    if path.split('/', 1)[0] not in settings.MEDIA_SERVE_DIRS:
+        raise Http404('Not a media file.')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (OSError, ValueError):
+        raise Http404('Media file not found.')
+    if not os.path.isfile(fullpath):
+        raise Http404('Media file not found.')
+    return path, fullpath, stat
+
+
+def media_etag(path, stat):
+    return quote_etag(content_hash_from_name(path) or f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def media_cache_control(path):
+    return IMMUTABLE_CACHE_CONTROL if content_hash_from_name(path) else DEFAULT_CACHE_CONTROL
+
+
+def requested_range(request, size, etag, last_modified):
+    """
+    The single byte range (start, end inclusive) asked for, None for the whole
+    file, or False if the range cannot be satisfied. Multi-range requests and a
+    stale If-Range get the whole file, which RFC 9110 allows.
+    """
+    header = request.META.get('HTTP_RANGE', '')
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = min(int(last), size)
+        if length == 0:
+            return False
+        return size - length, size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_file_range(fullpath, start, end):
+    with open(fullpath, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def sendfile_header(path, fullpath):
+    """(header, value) handing the file to the front-end server, or None to stream it from Python"""
+    mode = getattr(settings, 'MEDIA_SENDFILE', None)
+    if mode == 'x-sendfile':
+        return 'X-Sendfile', fullpath
+    if mode == 'x-accel-redirect':
+        return 'X-Accel-Redirect', settings.MEDIA_ACCEL_REDIRECT_PREFIX + path
+    return None
@@ -0,0 +1,110 @@
+"""
+Opt-in per-request SQL profiling.
+
+With SQL_PROFILING = True every request's queries are timed through a
+database execute wrapper (DEBUG is not needed). Each request produces one
+structured log line on the "bottle_MGMT.sql_profile" logger and is kept in an
+in-process ring buffer that the staff /debug/profile/ page reads. Query shapes
+(the SQL text with IN lists collapsed) that repeat SQL_PROFILE_REPEAT_THRESHOLD
+or more times are reported as likely N+1 patterns.
+
+With SQL_PROFILING off the middleware removes itself at startup
+(MiddlewareNotUsed), so it costs nothing per request. Queries run while a
+streaming response is being consumed happen after the middleware returns and
+are not counted.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger('bottle_MGMT.sql_profile')
+
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+SLOWEST_KEPT = 5
+
+_profiles = deque(maxlen=getattr(settings, 'SQL_PROFILE_HISTORY', 50))
+_profiles_lock = threading.Lock()
+
+
+def recent_profiles():
+    """Profiles of the last requests served by this process, newest first"""
+    with _profiles_lock:
+        return list(reversed(_profiles))
+
+
+def query_shape(sql):
+    return IN_LIST_RE.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper callable that times every statement"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+
+class SQLProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, 'SQL_PROFILE_REPEAT_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if request.path.startswith('/debug/profile/'):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        profile = self.build_profile(request, response, recorder.queries, time.perf_counter() - started)
+
+        logger.info(json.dumps(profile['summary'], sort_keys=True))
+        with _profiles_lock:
+            _profiles.append(profile)
+        return response
+
+    def build_profile(self, request, response, queries, elapsed):
+        shapes = Counter(query_shape(sql) for sql, _ in queries)
+        repeated = [
+            {'sql': shape, 'count': count}
+            for shape, count in shapes.most_common()
+            if count >= self.repeat_threshold
+        ]
+        slowest = sorted(queries, key=lambda query: query[1], reverse=True)[:SLOWEST_KEPT]
+        db_time = sum(duration for _, duration in queries)
+        summary = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': len(queries),
+            'db_ms': round(db_time * 1000, 2),
+            'total_ms': round(elapsed * 1000, 2),
+            'repeated_shapes': len(repeated),
+        }
+        return {
+            'summary': summary,
+            'at': timezone.now(),
+            'user': getattr(getattr(request, 'user', None), 'username', '') or '',
+            'slowest': [{'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in slowest],
+            'repeated': repeated,
+        }
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_balances(apps, schema_editor):
+    Transaction = apps.get_model('bottle_MGMT', 'Transaction')
+    BillTransaction = apps.get_model('bottle_MGMT', 'BillTransaction')
+    ClientBottleBalance = apps.get_model('bottle_MGMT', 'ClientBottleBalance')
+
+    custom_billed_ids = BillTransaction.objects.filter(bill__bill_type='custom').values('transaction_id')
+    unbilled = Q(billed=False) & ~Q(id__in=custom_billed_ids)
+    rows = Transaction.objects.order_by().values('client_id').annotate(
+        delivered=Count('id', filter=Q(transaction_type='delivered')),
+        returned=Count('id', filter=Q(transaction_type='returned')),
+        unbilled_delivered=Count('id', filter=unbilled & Q(transaction_type='delivered')),
+        unbilled_returned=Count('id', filter=unbilled & Q(transaction_type='returned')),
+    )
+    ClientBottleBalance.objects.bulk_create(
+        [ClientBottleBalance(**row) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0017_alter_transaction_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBottleBalance',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bottle_balance', serialize=False, to='bottle_MGMT.client')),
+                ('delivered', models.IntegerField(default=0)),
+                ('returned', models.IntegerField(default=0)),
+                ('unbilled_delivered', models.IntegerField(default=0)),
+                ('unbilled_returned', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    Bill = apps.get_model('bottle_MGMT', 'Bill')
+    DailySalesRollup = apps.get_model('bottle_MGMT', 'DailySalesRollup')
+
+    rows = Bill.objects.annotate(day=TruncDate('bill_date')).order_by().values('day', 'client_id').annotate(
+        bills=Count('id'),
+        amount=Sum('total_amount'),
+        paid_total=Sum('total_amount', filter=Q(paid=True), default=Decimal('0.00')),
+        unpaid_total=Sum('total_amount', filter=Q(paid=False), default=Decimal('0.00')),
+        delivered=Sum('delivered_bottles'),
+        returned=Sum('returned_bottles'),
+        pending=Sum('pending_bottles'),
+    )
+    DailySalesRollup.objects.bulk_create(
+        [
+            DailySalesRollup(
+                date=row['day'],
+                client_id=row['client_id'],
+                bill_count=row['bills'],
+                total_amount=row['amount'],
+                paid_amount=row['paid_total'],
+                unpaid_amount=row['unpaid_total'],
+                delivered_bottles=row['delivered'],
+                returned_bottles=row['returned'],
+                pending_bottles=row['pending'],
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0018_clientbottlebalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bill_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unpaid_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('delivered_bottles', models.IntegerField(default=0)),
+                ('returned_bottles', models.IntegerField(default=0)),
+                ('pending_bottles', models.IntegerField(default=0)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='bottle_MGMT.client')),
+            ],
+            options={
+                'unique_together': {('date', 'client')},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
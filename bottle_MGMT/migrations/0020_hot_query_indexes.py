@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0019_dailysalesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['client', 'bill_type'], name='bill_client_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['bill_date'], name='bill_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bottle',
+            index=models.Index(fields=['status'], name='bottle_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['client', 'transaction_type', 'billed'], name='txn_client_type_billed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['client', 'date'], name='txn_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['delivered_by', 'date'], name='txn_deliveredby_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date', 'id'], name='txn_date_id_idx'),
+        ),
+    ]
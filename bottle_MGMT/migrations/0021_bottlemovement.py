@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_movements(apps, schema_editor):
+    Transaction = apps.get_model('bottle_MGMT', 'Transaction')
+    BottleMovement = apps.get_model('bottle_MGMT', 'BottleMovement')
+
+    links = Transaction.bottles.through.objects.values_list(
+        'bottle_id', 'transaction_id', 'transaction__client_id',
+        'transaction__transaction_type', 'transaction__date',
+    )
+    batch = []
+    for bottle_id, transaction_id, client_id, transaction_type, date in links.iterator(chunk_size=2000):
+        batch.append(BottleMovement(
+            bottle_id=bottle_id,
+            transaction_id=transaction_id,
+            client_id=client_id,
+            transaction_type=transaction_type,
+            date=date,
+        ))
+        if len(batch) >= 2000:
+            BottleMovement.objects.bulk_create(batch)
+            batch = []
+    BottleMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0020_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BottleMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('delivered', 'Delivered'), ('returned', 'Returned')], max_length=10)),
+                ('date', models.DateTimeField()),
+                ('bottle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='bottle_MGMT.bottle')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bottle_movements', to='bottle_MGMT.client')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='bottle_MGMT.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bottle', 'date'], name='movement_bottle_date_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_movements, migrations.RunPython.noop),
+    ]
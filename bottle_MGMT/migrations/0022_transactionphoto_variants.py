@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0021_bottlemovement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionphoto',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='bottle_photos/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='transactionphoto',
+            name='web_image',
+            field=models.ImageField(blank=True, upload_to='bottle_photos/web/'),
+        ),
+    ]
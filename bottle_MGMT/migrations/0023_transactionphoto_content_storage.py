@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+import bottle_MGMT.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0022_transactionphoto_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactionphoto',
+            name='image',
+            field=models.ImageField(storage=bottle_MGMT.storage.photo_storage, upload_to='bottle_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='transactionphoto',
+            name='thumbnail',
+            field=models.ImageField(blank=True, storage=bottle_MGMT.storage.photo_storage, upload_to='bottle_photos/thumbs/'),
+        ),
+        migrations.AlterField(
+            model_name='transactionphoto',
+            name='web_image',
+            field=models.ImageField(blank=True, storage=bottle_MGMT.storage.photo_storage, upload_to='bottle_photos/web/'),
+        ),
+    ]
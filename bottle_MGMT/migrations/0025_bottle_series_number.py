@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+import re
+
+from django.db import migrations, models
+
+CODE_RE = re.compile(r'^\s*([A-Za-z]+)[\s-]*(\d+)\s*$')
+
+
+def backfill_code_parts(apps, schema_editor):
+    Bottle = apps.get_model('bottle_MGMT', 'Bottle')
+
+    batch = []
+    for bottle in Bottle.objects.only('id', 'code').iterator(chunk_size=2000):
+        match = CODE_RE.match(bottle.code or '')
+        if not match:
+            continue
+        bottle.series, bottle.number = match.group(1).upper(), int(match.group(2))
+        batch.append(bottle)
+        if len(batch) >= 2000:
+            Bottle.objects.bulk_update(batch, ['series', 'number'])
+            batch = []
+    Bottle.objects.bulk_update(batch, ['series', 'number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0024_client_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bottle',
+            name='number',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bottle',
+            name='series',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_code_parts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bottle',
+            index=models.Index(fields=['series', 'number'], name='bottle_series_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bottle',
+            index=models.Index(fields=['status', 'series', 'number'], name='bottle_status_series_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import re
+
+from django.db import migrations
+
+# Series may now hold digits ("O2-101" -> "O2", 101); codes like that were left unparsed by 0025
+CODE_RE = re.compile(r'^\s*([A-Za-z][A-Za-z0-9]*?)(?:[\s-]+|(?<=[A-Za-z]))(\d+)\s*$')
+
+
+def reparse_code_parts(apps, schema_editor):
+    Bottle = apps.get_model('bottle_MGMT', 'Bottle')
+
+    batch = []
+    for bottle in Bottle.objects.filter(number__isnull=True).only('id', 'code').iterator(chunk_size=2000):
+        match = CODE_RE.match(bottle.code or '')
+        if not match:
+            continue
+        bottle.series, bottle.number = match.group(1).upper(), int(match.group(2))
+        batch.append(bottle)
+        if len(batch) >= 2000:
+            Bottle.objects.bulk_update(batch, ['series', 'number'])
+            batch = []
+    Bottle.objects.bulk_update(batch, ['series', 'number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bottle_MGMT', '0025_bottle_series_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_code_parts, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
 from decimal import Decimal
+import re
+import time
+
+from .bill_pdf import schedule_bill_pdf
+from .storage import photo_storage
 
 # Create your models here.
 
@@ -33,15 +39,63 @@ class Client(models.Model):
     upi_number = models.CharField(max_length=15, blank=True, null=True)
     upi_qr = models.ImageField(upload_to="upi_qr/", blank=True, null=True)
 
+    # FTS5 index over the searchable fields, kept in sync by triggers (migration 0024)
+    SEARCH_TABLE = 'bottle_mgmt_client_fts'
+    SEARCH_FIELDS = ['name', 'company_name', 'gst_number', 'contact', 'alt_contact']
+
     def __str__(self):
         return f"{self.name} ({self.role})"
 
+    @staticmethod
+    def search_terms(query):
+        return re.findall(r'\w+', query or '')
+
+    @staticmethod
+    def search(query, clients=None):
+        """
+        Clients matching every word of the query as a prefix of any searchable field,
+        annotated with search_rank (bm25, lower is better; name matches weigh most).
+        """
+        from django.db import connection
+        from django.db.models.expressions import RawSQL
+
+        clients = Client.objects.all() if clients is None else clients
+        terms = Client.search_terms(query)
+        if not terms:
+            return clients.annotate(search_rank=models.Value(0.0)).none()
+
+        if connection.vendor != 'sqlite':
+            for term in terms:
+                condition = models.Q()
+                for field in Client.SEARCH_FIELDS:
+                    condition |= models.Q(**{f'{field}__icontains': term})
+                clients = clients.filter(condition)
+            return clients.annotate(search_rank=models.Value(0.0))
+
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = Client.SEARCH_TABLE
+        return clients.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", (match,)),
+        ).annotate(search_rank=RawSQL(
+            f"SELECT bm25({table}, 10.0, 4.0, 4.0, 2.0, 2.0) FROM {table} "
+            f"WHERE {table} MATCH %s AND {table}.rowid = {Client._meta.db_table}.id",
+            (match,),
+        ))
+
 class BottleCategory(models.Model):
     name = models.CharField(max_length=50, unique=True)
 
     def __str__(self):
         return self.name
 
+class BottleManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() skips save(), so fill the parsed code columns here
+        objs = list(objs)
+        for bottle in objs:
+            bottle.set_code_parts()
+        return super().bulk_create(objs, *args, **kwargs)
+
 class Bottle(models.Model):
     STATUS_CHOICES = [
         ('in_stock', 'In Stock'),
@@ -49,20 +103,164 @@ class Bottle(models.Model):
         ('returned', 'Returned'),
     ]
     code = models.CharField(max_length=10, unique=True)
+    # Parsed from code ("SV-123" -> "SV", 123) so codes sort and range-filter numerically;
+    # codes that don't follow the series-number pattern keep an empty series and no number
+    series = models.CharField(max_length=10, blank=True, default='', editable=False)
+    number = models.PositiveIntegerField(null=True, blank=True, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='in_stock')
     category = models.ForeignKey(BottleCategory, on_delete=models.SET_DEFAULT, default=1)
 
+    objects = BottleManager()
+
+    # A series starts with a letter and may hold digits ("O2-101" -> "O2", 101); without a
+    # separator it ends at its last letter ("SV123" -> "SV", 123)
+    CODE_RE = re.compile(r'^\s*([A-Za-z][A-Za-z0-9]*?)(?:[\s-]+|(?<=[A-Za-z]))(\d+)\s*$')
+    CODE_RANGE_RE = re.compile(
+        r'^([A-Za-z][A-Za-z0-9]*?)(?:[\s-]+|(?<=[A-Za-z]))(\d+)\s*(?:-|\u2013|\u2014|\.\.|to)\s*(?:\1[\s-]*)?(\d+)$',
+        re.IGNORECASE,
+    )
+    CODE_ORDER = ('series', 'number', 'code')
+
+    # Inventory counts are cached under a versioned key; bumping the version invalidates them.
+    # The version lives in the shared cache (CACHES in settings), so every worker sees a bump.
+    SNAPSHOT_VERSION_KEY = 'inventory_snapshot_version'
+    SNAPSHOT_TIMEOUT = 300
+
     def __str__(self):
         return f"Bottle {self.code}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='bottle_status_idx'),
+            # Series ranges in numeric order (inventory search, range picking)
+            models.Index(fields=['series', 'number'], name='bottle_series_number_idx'),
+            models.Index(fields=['status', 'series', 'number'], name='bottle_status_series_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.set_code_parts()
+        super().save(*args, **kwargs)
+        Bottle.invalidate_inventory_snapshot()
+
     @staticmethod
-    def bulk_create_bottles(start=101, end=250):
+    def parse_code(code):
+        """("SV", 123) for "SV-123", "sv 123" or "SV123", ("O2", 7) for "O2-7"; ("", None) for anything else"""
+        match = Bottle.CODE_RE.match(code or '')
+        if not match:
+            return '', None
+        return match.group(1).upper(), int(match.group(2))
+
+    def set_code_parts(self):
+        self.series, self.number = Bottle.parse_code(self.code)
+
+    @staticmethod
+    def code_filter(text):
+        """
+        Q for an inventory search: "SV 100-250" (also "SV-100 to SV-250") is a numeric
+        range, "SV-123" one bottle, "SV" a whole series and "123" that number in any
+        series; all of these use the series/number index. Anything else is a substring match.
+        """
+        text = (text or '').strip()
+        # A single code first: "O2-101" is bottle 101 of series O2, not O-2 to O-101
+        series, number = Bottle.parse_code(text)
+        if number is not None:
+            return models.Q(series=series, number=number)
+        match = Bottle.CODE_RANGE_RE.match(text)
+        if match:
+            low, high = sorted((int(match.group(2)), int(match.group(3))))
+            return models.Q(series=match.group(1).upper(), number__range=(low, high))
+        if text.isalpha():
+            return models.Q(series=text.upper())
+        if text.isdigit():
+            return models.Q(number=int(text))
+        return models.Q(code__icontains=text)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Bottle.invalidate_inventory_snapshot()
+        return result
+
+    @staticmethod
+    def bulk_create_bottles(start=101, end=250, series='SV', category=None, batch_size=900):
+        """
+        Create bottles {series}-{start}..{series}-{end}, skipping codes that already exist.
+        Existing codes are found with one query (by series and number, so "SV101" counts as
+        SV-101, plus any unparsed codes) and new bottles are inserted with batched
+        bulk_create. Returns (created_count, skipped_numbers).
+        """
+        if category is not None:
+            category_id = category.id
+        else:
+            category_id = Bottle._meta.get_field('category').get_default()
+        codes = {f"{series}-{i}": i for i in range(start, end + 1)}
+        existing = set()
+        for code, number in Bottle.objects.filter(
+            models.Q(series=Bottle.parse_code(f"{series}-{start}")[0], number__range=(start, end))
+            | models.Q(series='', code__startswith=f"{series}-")
+        ).values_list('code', 'number'):
+            existing.add(number if number is not None else codes.get(code))
         bottles = []
+        skipped = []
         for i in range(start, end + 1):
-            code = f"SV-{i}"
-            if not Bottle.objects.filter(code=code).exists():
-                bottles.append(Bottle(code=code, status='in_stock'))
-        Bottle.objects.bulk_create(bottles)
+            if i in existing:
+                skipped.append(i)
+            else:
+                bottles.append(Bottle(code=f"{series}-{i}", status='in_stock', category_id=category_id))
+        with db_transaction.atomic():
+            Bottle.objects.bulk_create(bottles, batch_size=batch_size)
+        Bottle.invalidate_inventory_snapshot()
+        return len(bottles), skipped
+
+    @staticmethod
+    def invalidate_inventory_snapshot():
+        """
+        Call after any bottle status change that bypasses save() (update(), bulk_create()).
+        The version changes once the surrounding transaction commits, so no worker caches
+        counts read before the change under the new version.
+        """
+        # A fresh value rather than cache.incr(): on the file cache incr is a get and a set,
+        # and two workers bumping at once could both write the same next version
+        db_transaction.on_commit(lambda: cache.set(Bottle.SNAPSHOT_VERSION_KEY, time.time_ns(), None))
+
+    @staticmethod
+    def compute_inventory_snapshot():
+        """Bottle counts by status, overall and per category, from a single GROUP BY query"""
+        statuses = [value for value, _ in Bottle.STATUS_CHOICES]
+        snapshot = dict.fromkeys(statuses, 0)
+        snapshot['total'] = 0
+        categories = {}
+
+        rows = Bottle.objects.order_by().values('category_id', 'category__name', 'status').annotate(
+            count=models.Count('id')
+        )
+        for row in rows:
+            category = categories.setdefault(row['category_id'], {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'total': 0,
+                **dict.fromkeys(statuses, 0),
+            })
+            category[row['status']] = category.get(row['status'], 0) + row['count']
+            category['total'] += row['count']
+            snapshot[row['status']] = snapshot.get(row['status'], 0) + row['count']
+            snapshot['total'] += row['count']
+
+        snapshot['by_category'] = sorted(categories.values(), key=lambda c: c['name'] or '')
+        return snapshot
+
+    @staticmethod
+    def inventory_snapshot():
+        """Cached result of compute_inventory_snapshot(), shared by the dashboards"""
+        version = cache.get(Bottle.SNAPSHOT_VERSION_KEY)
+        if version is None:
+            cache.add(Bottle.SNAPSHOT_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(Bottle.SNAPSHOT_VERSION_KEY)
+        key = f'inventory_snapshot:{version}'
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = Bottle.compute_inventory_snapshot()
+            cache.set(key, snapshot, Bottle.SNAPSHOT_TIMEOUT)
+        return snapshot
 
 class BottlePricing(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, default=100)
@@ -91,13 +289,93 @@ class Transaction(models.Model):
     def __str__(self):
         return f"{self.bottle} - {self.transaction_type} - {self.client}"
 
+    class Meta:
+        indexes = [
+            # Unbilled counts and billing updates per client
+            models.Index(fields=['client', 'transaction_type', 'billed'], name='txn_client_type_billed_idx'),
+            # A client's history, newest first (custom billing)
+            models.Index(fields=['client', 'date'], name='txn_client_date_idx'),
+            # A delivery user's own transactions and dashboard
+            models.Index(fields=['delivered_by', 'date'], name='txn_deliveredby_date_idx'),
+            # Keyset pagination of the transaction list
+            models.Index(fields=['date', 'id'], name='txn_date_id_idx'),
+        ]
+
 class TransactionPhoto(models.Model):
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='photos')
-    image = models.ImageField(upload_to='bottle_photos/')
+    # Stored by content hash, so identical uploads share one file (see storage.py)
+    image = models.ImageField(upload_to='bottle_photos/', storage=photo_storage)
+    # Resized copies built off the request thread (see photo_variants); empty until ready
+    thumbnail = models.ImageField(upload_to='bottle_photos/thumbs/', blank=True, storage=photo_storage)
+    web_image = models.ImageField(upload_to='bottle_photos/web/', blank=True, storage=photo_storage)
 
     def __str__(self):
         return f"Photo for Transaction {self.transaction.id}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.image and not self.thumbnail:
+            from .photo_variants import schedule_photo_variants
+            photo_id = self.id
+            db_transaction.on_commit(lambda: schedule_photo_variants(photo_id))
+
+    @property
+    def thumbnail_url(self):
+        """Small image for lists; falls back to the original until the thumbnail exists"""
+        return (self.thumbnail or self.image).url
+
+    @property
+    def web_url(self):
+        return (self.web_image or self.image).url
+
+class BottleMovement(models.Model):
+    """One row per bottle per transaction, so a bottle's history is a single indexed range read"""
+    bottle = models.ForeignKey(Bottle, on_delete=models.CASCADE, related_name='movements')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='movements')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='bottle_movements')
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE)
+    date = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.bottle} {self.transaction_type} - {self.client} on {self.date:%Y-%m-%d}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bottle', 'date'], name='movement_bottle_date_idx'),
+        ]
+
+    @staticmethod
+    def for_transactions(transactions, bottle_ids):
+        """Unsaved movements for saved transactions; bottle_ids[i] lists the bottles of transactions[i]"""
+        return [
+            BottleMovement(
+                bottle_id=bottle_id,
+                transaction_id=transaction.id,
+                client_id=transaction.client_id,
+                transaction_type=transaction.transaction_type,
+                date=transaction.date,
+            )
+            for transaction, ids in zip(transactions, bottle_ids)
+            for bottle_id in ids
+        ]
+
+    @staticmethod
+    def history(bottle):
+        """Every movement of a bottle, newest first"""
+        return BottleMovement.objects.filter(bottle=bottle).order_by('-date', '-id')
+
+    @staticmethod
+    def last_movement(bottle):
+        return BottleMovement.history(bottle).select_related('client').first()
+
+    @staticmethod
+    def current_holder(bottle):
+        """The client holding the bottle, or None if its last movement was a return"""
+        movement = BottleMovement.last_movement(bottle)
+        if movement and movement.transaction_type == 'delivered':
+            return movement.client
+        return None
+
 class Bill(models.Model):
     BILL_TYPE_CHOICES = [
         ('auto', 'Automated'),
@@ -129,8 +407,80 @@ class Bill(models.Model):
     def __str__(self):
         return f"Bill for {self.client.name} - {self.bill_date.strftime('%Y-%m-%d')}"
 
+    @staticmethod
+    def in_date_range(start, end, client_id=None, paid=None):
+        """Bills dated from start through end (local dates, inclusive), oldest first"""
+        from datetime import datetime, timedelta
+
+        tz = timezone.get_current_timezone()
+        bills = Bill.objects.filter(
+            bill_date__gte=timezone.make_aware(datetime.combine(start, datetime.min.time()), tz),
+            bill_date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time()), tz),
+        )
+        if client_id is not None:
+            bills = bills.filter(client_id=client_id)
+        if paid is not None:
+            bills = bills.filter(paid=paid)
+        return bills.select_related('client', 'generated_by').order_by('bill_date', 'id')
+
+    @staticmethod
+    def create_auto_bills(client_ids, price, generated_by=None):
+        """
+        Auto-bill each client for its unbilled transactions and queue their PDFs; returns
+        the new bills (none for clients with nothing left to bill). The counts are read from the balance ledger only
+        after the transactions are marked billed, under the same write lock, so a transaction
+        saved meanwhile is in both the bill and the billed rows or in neither.
+        """
+        from django.db import connection
+
+        with db_transaction.atomic():
+            if connection.features.has_select_for_update:
+                # Hold the ledger rows, so no transaction for these clients is recorded until this commits
+                list(ClientBottleBalance.objects.select_for_update().filter(client_id__in=client_ids).values_list('pk'))
+
+            # Mark all unbilled transactions as billed (excluding those already in custom bills);
+            # on SQLite this write takes the database lock
+            Transaction.objects.filter(
+                client_id__in=client_ids,
+                billed=False
+            ).exclude(
+                id__in=BillTransaction.objects.filter(
+                    bill__client_id__in=client_ids, bill__bill_type='custom'
+                ).values('transaction_id')
+            ).update(billed=True)
+
+            balances = ClientBottleBalance.objects.filter(
+                models.Q(unbilled_delivered__gt=0) | models.Q(unbilled_returned__gt=0),
+                client_id__in=client_ids,
+            ).order_by('client_id')
+            bills = Bill.objects.bulk_create([
+                Bill(
+                    client_id=balance.client_id,
+                    delivered_bottles=balance.unbilled_delivered,
+                    returned_bottles=balance.unbilled_returned,
+                    pending_bottles=balance.unbilled_pending,
+                    price_per_bottle=price,
+                    total_amount=balance.unbilled_pending * price,
+                    generated_by=generated_by,
+                    bill_type='auto',
+                )
+                for balance in balances
+            ])
+
+            ClientBottleBalance.clear_unbilled(client_ids)
+            DailySalesRollup.add_bills(bills)
+            # Every caller (the bill page, run_billing) gets the PDFs rendered in the background
+            # once the bills are committed, so the first download is served from the cache
+            bill_ids = [bill.id for bill in bills]
+            db_transaction.on_commit(lambda: [schedule_bill_pdf(bill_id) for bill_id in bill_ids])
+        return bills
+
     class Meta:
         ordering = ['-bill_date']
+        indexes = [
+            models.Index(fields=['client', 'bill_type'], name='bill_client_type_idx'),
+            models.Index(fields=['bill_date'], name='bill_date_idx'),
+        ]
 
 class BillTransaction(models.Model):
     """Model to track which transactions are included in custom bills"""
@@ -143,3 +493,265 @@ class BillTransaction(models.Model):
 
     class Meta:
         unique_together = ['bill', 'transaction']
+
+class ClientBottleBalance(models.Model):
+    """Running per-client bottle totals, kept in step with transactions and bills"""
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True, related_name='bottle_balance')
+    delivered = models.IntegerField(default=0)
+    returned = models.IntegerField(default=0)
+    unbilled_delivered = models.IntegerField(default=0)
+    unbilled_returned = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = ['delivered', 'returned', 'unbilled_delivered', 'unbilled_returned']
+
+    def __str__(self):
+        return f"Balance for {self.client.name}: {self.pending} pending"
+
+    @property
+    def pending(self):
+        return self.delivered - self.returned
+
+    @property
+    def unbilled_pending(self):
+        return self.unbilled_delivered - self.unbilled_returned
+
+    @staticmethod
+    def record_transaction(transaction):
+        """Count a newly created (unbilled) transaction against its client's balance"""
+        ClientBottleBalance.record_transactions([transaction])
+
+    @staticmethod
+    def record_transactions(transactions):
+        """Count newly created (unbilled) transactions, one UPDATE per affected client"""
+        deltas = {}
+        for transaction in transactions:
+            counts = deltas.setdefault(transaction.client_id, {})
+            counts[transaction.transaction_type] = counts.get(transaction.transaction_type, 0) + 1
+
+        ClientBottleBalance.objects.bulk_create(
+            [ClientBottleBalance(client_id=client_id) for client_id in deltas],
+            ignore_conflicts=True,
+        )
+        now = timezone.now()
+        for client_id, counts in deltas.items():
+            updates = {'updated_at': now}
+            for field, count in counts.items():
+                updates[field] = models.F(field) + count
+                updates[f'unbilled_{field}'] = models.F(f'unbilled_{field}') + count
+            ClientBottleBalance.objects.filter(client_id=client_id).update(**updates)
+
+    @staticmethod
+    def clear_unbilled(client_ids):
+        """An auto bill covers every unbilled transaction that is not in a custom bill"""
+        ClientBottleBalance.objects.filter(client_id__in=client_ids).update(
+            unbilled_delivered=0,
+            unbilled_returned=0,
+            updated_at=timezone.now(),
+        )
+
+    @staticmethod
+    def compute_from_history(clients=None):
+        """Recount balances from Transaction rows in one grouped query: {client_id: {field: count}}"""
+        custom_billed_ids = BillTransaction.objects.filter(
+            bill__bill_type='custom'
+        ).values('transaction_id')
+        unbilled = models.Q(billed=False) & ~models.Q(id__in=custom_billed_ids)
+
+        transactions = Transaction.objects.all()
+        if clients is not None:
+            transactions = transactions.filter(client__in=clients)
+        rows = transactions.order_by().values('client_id').annotate(
+            delivered=models.Count('id', filter=models.Q(transaction_type='delivered')),
+            returned=models.Count('id', filter=models.Q(transaction_type='returned')),
+            unbilled_delivered=models.Count('id', filter=unbilled & models.Q(transaction_type='delivered')),
+            unbilled_returned=models.Count('id', filter=unbilled & models.Q(transaction_type='returned')),
+        )
+        return {row.pop('client_id'): row for row in rows}
+
+    @staticmethod
+    def rebuild(clients=None, dry_run=False):
+        """
+        Recompute balances from history and repair the rows that drifted.
+        Returns a list of (client_id, stored, expected) for every drifted balance.
+        """
+        expected = ClientBottleBalance.compute_from_history(clients)
+        stored_qs = ClientBottleBalance.objects.all()
+        if clients is not None:
+            stored_qs = stored_qs.filter(client__in=clients)
+        stored = {
+            row.pop('client_id'): row
+            for row in stored_qs.values('client_id', *ClientBottleBalance.COUNTER_FIELDS)
+        }
+
+        zero = dict.fromkeys(ClientBottleBalance.COUNTER_FIELDS, 0)
+        drift = []
+        for client_id in expected.keys() | stored.keys():
+            want = expected.get(client_id, zero)
+            have = stored.get(client_id)
+            if have != want and not (have is None and want == zero):
+                drift.append((client_id, have, want))
+
+        if drift and not dry_run:
+            ClientBottleBalance.objects.bulk_create(
+                [ClientBottleBalance(client_id=client_id, **want) for client_id, _, want in drift],
+                update_conflicts=True,
+                unique_fields=['client'],
+                update_fields=ClientBottleBalance.COUNTER_FIELDS + ['updated_at'],
+                batch_size=500,
+            )
+        return drift
+
+class DailySalesRollup(models.Model):
+    """Bill totals per business day and client, kept in step with the bill lifecycle"""
+    date = models.DateField()
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='daily_sales')
+    bill_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    unpaid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    delivered_bottles = models.IntegerField(default=0)
+    returned_bottles = models.IntegerField(default=0)
+    pending_bottles = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Sales for {self.client.name} on {self.date}"
+
+    # Counters that bills add to (and deleted bills subtract from)
+    TOTAL_FIELDS = [
+        'bill_count', 'total_amount', 'paid_amount', 'unpaid_amount',
+        'delivered_bottles', 'returned_bottles', 'pending_bottles',
+    ]
+
+    class Meta:
+        unique_together = ['date', 'client']
+
+    @staticmethod
+    def business_date(bill):
+        return timezone.localtime(bill.bill_date).date()
+
+    @staticmethod
+    def add_bill(bill, sign=1):
+        """Add a newly created bill to its day's totals (sign=-1 removes a deleted bill)"""
+        DailySalesRollup.add_bills([bill], sign)
+
+    @staticmethod
+    def bill_totals(bills, sign=1):
+        """{(date, client_id): {field: delta}} summing the bills (sign=-1 for removals)"""
+        totals = {}
+        for bill in bills:
+            amount = bill.total_amount * sign
+            row = totals.setdefault((DailySalesRollup.business_date(bill), bill.client_id), {
+                'bill_count': 0,
+                'total_amount': Decimal('0.00'),
+                'paid_amount': Decimal('0.00'),
+                'unpaid_amount': Decimal('0.00'),
+                'delivered_bottles': 0,
+                'returned_bottles': 0,
+                'pending_bottles': 0,
+            })
+            row['bill_count'] += sign
+            row['total_amount'] += amount
+            row['paid_amount' if bill.paid else 'unpaid_amount'] += amount
+            row['delivered_bottles'] += bill.delivered_bottles * sign
+            row['returned_bottles'] += bill.returned_bottles * sign
+            row['pending_bottles'] += bill.pending_bottles * sign
+        return totals
+
+    @staticmethod
+    def add_bills(bills, sign=1, batch_size=500):
+        """
+        Add newly created bills to their days' totals (sign=-1 removes deleted bills).
+        The bills are summed per day and client first, and every sum is applied by a
+        single INSERT ... ON CONFLICT DO UPDATE that adds to the existing row.
+        """
+        from django.db import connection
+
+        totals = DailySalesRollup.bill_totals(bills, sign)
+        if not connection.features.supports_update_conflicts_with_target:
+            for (date, client_id), deltas in totals.items():
+                DailySalesRollup.objects.get_or_create(date=date, client_id=client_id)
+                DailySalesRollup.objects.filter(date=date, client_id=client_id).update(
+                    **{field: models.F(field) + delta for field, delta in deltas.items()}
+                )
+            return
+
+        opts = DailySalesRollup._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        fields = [opts.get_field(name) for name in ['date', 'client', *DailySalesRollup.TOTAL_FIELDS]]
+        columns = ', '.join(qn(field.column) for field in fields)
+        row_placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        updates = ', '.join(
+            f'{qn(name)} = {table}.{qn(name)} + excluded.{qn(name)}' for name in DailySalesRollup.TOTAL_FIELDS
+        )
+        rows = [
+            (date, client_id, *(deltas[name] for name in DailySalesRollup.TOTAL_FIELDS))
+            for (date, client_id), deltas in totals.items()
+        ]
+        with connection.cursor() as cursor:
+            for offset in range(0, len(rows), batch_size):
+                batch = rows[offset:offset + batch_size]
+                params = [
+                    field.get_db_prep_save(value, connection)
+                    for row in batch
+                    for field, value in zip(fields, row)
+                ]
+                cursor.execute(
+                    f'INSERT INTO {table} ({columns}) VALUES {", ".join([row_placeholder] * len(batch))} '
+                    f'ON CONFLICT ({qn(opts.get_field("date").column)}, {qn(opts.get_field("client").column)}) '
+                    f'DO UPDATE SET {updates}',
+                    params,
+                )
+
+    @staticmethod
+    def remove_bill(bill):
+        DailySalesRollup.add_bill(bill, sign=-1)
+
+    @staticmethod
+    def mark_paid(bill):
+        """Move an unpaid bill's amount to the paid column of its day"""
+        DailySalesRollup.objects.filter(
+            date=DailySalesRollup.business_date(bill), client_id=bill.client_id
+        ).update(
+            paid_amount=models.F('paid_amount') + bill.total_amount,
+            unpaid_amount=models.F('unpaid_amount') - bill.total_amount,
+        )
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """Rebuild every row from the Bill table in one streamed GROUP BY pass; returns rows written"""
+        from django.db.models.functions import TruncDate
+
+        rows = Bill.objects.annotate(day=TruncDate('bill_date')).order_by().values('day', 'client_id').annotate(
+            bills=models.Count('id'),
+            amount=models.Sum('total_amount'),
+            paid_total=models.Sum('total_amount', filter=models.Q(paid=True), default=Decimal('0.00')),
+            unpaid_total=models.Sum('total_amount', filter=models.Q(paid=False), default=Decimal('0.00')),
+            delivered=models.Sum('delivered_bottles'),
+            returned=models.Sum('returned_bottles'),
+            pending=models.Sum('pending_bottles'),
+        )
+        written = 0
+        with db_transaction.atomic():
+            DailySalesRollup.objects.all().delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(DailySalesRollup(
+                    date=row['day'],
+                    client_id=row['client_id'],
+                    bill_count=row['bills'],
+                    total_amount=row['amount'],
+                    paid_amount=row['paid_total'],
+                    unpaid_amount=row['unpaid_total'],
+                    delivered_bottles=row['delivered'],
+                    returned_bottles=row['returned'],
+                    pending_bottles=row['pending'],
+                ))
+                if len(batch) >= batch_size:
+                    DailySalesRollup.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            DailySalesRollup.objects.bulk_create(batch)
+            written += len(batch)
+        return written
@@ -0,0 +1,81 @@
+"""
+Resized variants of TransactionPhoto images.
+
+Every photo gets a small JPEG thumbnail (used in lists and modals) and a
+web-sized JPEG (used when a photo is opened); the original upload is kept
+untouched and stays linked. Variants are built on a small worker pool after
+the photo's transaction commits, so uploads never wait on image resizing.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _resize_jpeg(image, size, quality):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    output = BytesIO()
+    variant.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def render_variants(source):
+    """(thumbnail bytes, web bytes) for an open image file"""
+    with Image.open(source) as image:
+        # Phone photos are often stored sideways with an EXIF rotation flag
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        return (
+            _resize_jpeg(image, settings.PHOTO_THUMBNAIL_SIZE, quality=75),
+            _resize_jpeg(image, settings.PHOTO_WEB_SIZE, quality=82),
+        )
+
+
+def build_variants(photo):
+    """Render and store both variants for a photo; returns the (thumbnail, web_image) names"""
+    with photo.image.open('rb') as source:
+        thumbnail, web_image = render_variants(source)
+
+    stem = os.path.splitext(os.path.basename(photo.image.name))[0]
+    photo.thumbnail.save(f'{stem}.jpg', ContentFile(thumbnail), save=False)
+    photo.web_image.save(f'{stem}.jpg', ContentFile(web_image), save=False)
+    return photo.thumbnail.name, photo.web_image.name
+
+
+def store_variants(photo):
+    """Build the variants and record them without going through TransactionPhoto.save()"""
+    from .models import TransactionPhoto
+
+    thumbnail, web_image = build_variants(photo)
+    TransactionPhoto.objects.filter(id=photo.id).update(thumbnail=thumbnail, web_image=web_image)
+
+
+def schedule_photo_variants(photo_id):
+    """Build the photo's variants in the background worker pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.PHOTO_VARIANT_WORKERS, thread_name_prefix='photo-variants')
+    return _executor.submit(_build_in_background, photo_id)
+
+
+def _build_in_background(photo_id):
+    from .models import TransactionPhoto
+
+    close_old_connections()
+    try:
+        photo = TransactionPhoto.objects.filter(id=photo_id).first()
+        if photo is not None and photo.image:
+            store_variants(photo)
+    except Exception:
+        logger.exception('Building variants for photo %s failed', photo_id)
+    finally:
+        connection.close()
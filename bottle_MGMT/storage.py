@@ -0,0 +1,71 @@
+"""
+Content-addressed storage for transaction photos.
+
+A file is stored as <upload_to>/<h[0:2]>/<h[2:4]>/<h><ext>, where h is the
+SHA-256 of its bytes. Saving the same image twice stores it once and returns
+the same name, and the two levels of hash-prefix directories keep every
+directory small however many photos there are.
+
+Because one file can back several rows, files are never removed when a row is
+deleted; orphans are cleaned up by the migrate_photo_storage command.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+CONTENT_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:\.\w+)?$')
+
+
+def content_hash(content):
+    """SHA-256 hex digest of a Django File, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_hash_from_name(name):
+    """The hash a content-addressed name was built from, or None for any other name"""
+    match = CONTENT_NAME_RE.search(name or '')
+    return match.group(1) if match else None
+
+
+def is_content_addressed(name):
+    return content_hash_from_name(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        """Storage name for content uploaded as `name` (only its directory and extension are kept)"""
+        directory, filename = os.path.split(name)
+        # Uploads arrive already hashed by HashingTemporaryFileUploadHandler
+        digest = getattr(content, 'sha256', None) or content_hash(content)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4], f'{digest}{extension}').replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Same bytes already stored: share the file
+            return name
+        return self._save(name, content)
+
+
+_photo_storage = None
+
+
+def photo_storage():
+    """Storage for TransactionPhoto files (a callable, so migrations do not capture settings)"""
+    global _photo_storage
+    if _photo_storage is None:
+        _photo_storage = ContentAddressedStorage()
+    return _photo_storage
@@ -1,3 +1,307 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client as TestClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+
+from .bench_data import EXPECTED_STATUS, SKIPPED_URLS, benchmark_urls, benchmark_user, sample_params, seed_bench_data
+from .bill_pdf import bill_pdf_filename
+from .forms import MAX_BOTTLES_PER_TRANSACTION, parse_bottle_selection, resolve_bottle_selection
+from .models import (
+    Bill, Bottle, BottleCategory, BottleMovement, Client, ClientBottleBalance, DailySalesRollup, Transaction,
+)
+from .views import BottlesMovedError, save_transactions
+
+# (clients, bottles, transactions, days of history). The busiest client of the second size
+# has several times the transactions and bills of the first, so per-row queries show up.
+QUERY_COUNT_SIZES = [(4, 60, 150, 45), (16, 240, 1200, 180)]
+
+# Most queries any request to the URL may run, counting the session and user lookups.
+# Lower a budget when a view gets cheaper; raising one needs a reason.
+QUERY_BUDGETS = {
+    'login': 0,
+    'admin_dashboard': 5,
+    'delivery_dashboard': 4,
+    'client_list': 4,
+    'export_balances_csv': 3,
+    'client_typeahead': 3,
+    'client_create': 2,
+    'transaction_list': 5,
+    'transaction_create': 2,
+    'delivery_run': 2,
+    'export_transactions_csv': 4,
+    'reports': 11,
+    'inventory': 4,
+    'inventory_snapshot': 2,
+    'add_bottles': 3,
+    'bottle_photos': 5,
+    'debug_photos': 2,
+    'debug_profile': 2,
+    'pricing': 3,
+    'generate_bill': 11,
+    'custom_billing': 9,
+    'create_custom_bill': 2,
+    'bill_history': 4,
+    'export_bills_zip': 3,
+    'export_bills_csv': 3,
+    'mark_bill_paid': 5,
+    'delete_bill': 5,
+    'sales_analytics': 6,
+    'admin_profile': 3,
+    'category_list': 3,
+    'category_create': 2,
+    'category_edit': 3,
+    'serve_media': 2,
+}
+
+
+def count_queries(client, url, expected_status=200):
+    """Queries run by a GET of url, including any run while its streamed body is read"""
+    # Rolled back, so views that write on GET (generate_bill) leave the data unchanged
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    # Counts from an error page or a redirect say nothing about the view
+    if response.status_code != expected_status:
+        raise AssertionError(f'GET {url} returned {response.status_code}, expected {expected_status}.')
+    return len(queries)
+
+
+class ViewQueryCountTests(TestCase):
+    """
+    Every project URL is requested against seeded data at each of
+    QUERY_COUNT_SIZES. A view's query count must not change with the amount of
+    data (a per-row query would) and must stay within its QUERY_BUDGETS entry.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.mkdtemp()
+        # Seeded photos, rendered bill PDFs and cache entries stay out of the project directories
+        cls.scratch_settings = override_settings(
+            MEDIA_ROOT=cls.scratch,
+            BILL_PDF_CACHE_DIR=cls.scratch,
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(cls.scratch, 'cache'),
+            }},
+        )
+        cls.scratch_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.scratch_settings.disable()
+        shutil.rmtree(cls.scratch, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = [cls.measure(size) for size in QUERY_COUNT_SIZES]
+
+    @classmethod
+    def measure(cls, size):
+        """{label: (url name, queries)} for every benchmarked URL against data of the given size"""
+        counts = {}
+        clients, bottles, transactions, days = size
+        with transaction.atomic():
+            # The views only let the default admin in; it also delivers the seeded
+            # transactions, so the delivery dashboard lists some
+            user = benchmark_user()
+            # Bills are left unpaid so mark_bill_paid and delete_bill render their forms
+            seed_bench_data(clients, bottles, transactions, seed=1, days=days, paid_ratio=0, drivers=[user])
+            # admin_profile creates this on its first visit; measure the usual case
+            Client.objects.create(role='admin', name='Admin Profile', contact='0000000000', email='admin@example.com', address='-')
+            client = TestClient()
+            client.force_login(user)
+            for url_name, label, url in benchmark_urls(sample_params(seeded=True)):
+                expected_status = EXPECTED_STATUS.get(url_name, 200)
+                # The first request fills caches; the steady state is what is measured
+                count_queries(client, url, expected_status)
+                counts[label] = (url_name, count_queries(client, url, expected_status))
+            transaction.set_rollback(True)
+        return counts
+
+    def test_every_url_is_measured_and_budgeted(self):
+        url_names = {
+            pattern.name for pattern in get_resolver().url_patterns
+            if isinstance(pattern, URLPattern) and pattern.name not in SKIPPED_URLS
+        }
+        for counts in self.counts:
+            self.assertEqual({url_name for url_name, _ in counts.values()}, url_names)
+        self.assertEqual(set(QUERY_BUDGETS), url_names)
+
+    def test_query_counts_do_not_grow_with_data(self):
+        smaller, larger = self.counts
+        for label, (_, count) in larger.items():
+            with self.subTest(url=label):
+                self.assertEqual(
+                    count, smaller[label][1],
+                    f'{label} runs {smaller[label][1]} queries on the smaller data set and {count} on the '
+                    'larger one; look for a query per row (a missing select_related or prefetch_related).',
+                )
+
+    def test_query_counts_within_budget(self):
+        for counts in self.counts:
+            for label, (url_name, count) in counts.items():
+                with self.subTest(url=label):
+                    self.assertLessEqual(count, QUERY_BUDGETS[url_name], f'{label} is over its query budget.')
+
+
+class BottleCodeTests(TestCase):
+    """Bottle codes split into series and number, including series that hold digits"""
+
+    def test_parse_code(self):
+        self.assertEqual(Bottle.parse_code('SV-123'), ('SV', 123))
+        self.assertEqual(Bottle.parse_code('sv 123'), ('SV', 123))
+        self.assertEqual(Bottle.parse_code('SV123'), ('SV', 123))
+        self.assertEqual(Bottle.parse_code('O2-101'), ('O2', 101))
+        self.assertEqual(Bottle.parse_code('a1b2 5'), ('A1B2', 5))
+        self.assertEqual(Bottle.parse_code('2X-1'), ('', None))
+        self.assertEqual(Bottle.parse_code('SV-100-250'), ('', None))
+
+    def test_parse_bottle_selection_with_digit_series(self):
+        self.assertEqual(parse_bottle_selection('O2-101'), [('code', 'O2', 101)])
+        self.assertEqual(
+            parse_bottle_selection('O2-101..O2-105; O2-7 to 9, SV 100-250'),
+            [('range', 'O2', 101, 105), ('range', 'O2', 7, 9), ('range', 'SV', 100, 250)],
+        )
+
+    def test_oversized_selection_is_rejected_before_lookup(self):
+        with self.assertNumQueries(0):
+            bottle_ids, errors = resolve_bottle_selection(parse_bottle_selection('SV 1-20000000'))
+        self.assertEqual((bottle_ids, errors), ([], [f'Select at most {MAX_BOTTLES_PER_TRANSACTION} bottles per transaction.']))
+        # Overlapping ranges count each bottle once
+        last = MAX_BOTTLES_PER_TRANSACTION
+        _, errors = resolve_bottle_selection(parse_bottle_selection(f'SV 1-{last - 100}, SV 50-{last}, SV-7'))
+        self.assertEqual(errors, [f'Unknown bottles: SV-1..SV-{last}.'])
+
+    def test_code_filter_with_digit_series(self):
+        Bottle.objects.bulk_create([Bottle(code=f'O2-{i}') for i in range(100, 104)] + [Bottle(code='O-2')])
+        self.assertEqual(list(Bottle.objects.filter(Bottle.code_filter('o2-101')).values_list('code', flat=True)), ['O2-101'])
+        self.assertEqual(Bottle.objects.filter(Bottle.code_filter('O2-101 to O2-103')).count(), 3)
+
+    def test_bulk_create_bottles_skips_existing_codes(self):
+        category = BottleCategory.objects.create(name='Test 20L')
+        self.assertEqual(Bottle.bulk_create_bottles(100, 102, 'O2', category), (3, []))
+        bottle = Bottle.objects.get(code='O2-101')
+        self.assertEqual((bottle.series, bottle.number), ('O2', 101))
+        # Run again, with one more code at the end
+        self.assertEqual(Bottle.bulk_create_bottles(100, 103, 'O2', category), (1, [100, 101, 102]))
+        # "SV101" is the same bottle as SV-101
+        Bottle.objects.create(code='SV101', category=category)
+        self.assertEqual(Bottle.bulk_create_bottles(100, 101, 'SV', category), (1, [101]))
+        # Codes that don't parse are matched by code
+        self.assertEqual(Bottle.bulk_create_bottles(1, 1, '2X', category), (1, []))
+        self.assertEqual(Bottle.bulk_create_bottles(1, 1, '2X', category), (0, [1]))
+
+    def test_bulk_create_bottles_checks_duplicates_with_one_query(self):
+        category = BottleCategory.objects.create(name='Test 20L')
+        with CaptureQueriesContext(connection) as queries:
+            Bottle.bulk_create_bottles(1, 5000, 'SV', category)
+        selects = [query for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+
+
+class SaveTransactionsTests(TestCase):
+    """save_transactions only moves bottles that still have the status their form checked"""
+
+    def test_bottle_moved_by_another_request_saves_nothing(self):
+        user = User.objects.create_user('driver')
+        client = Client.objects.create(name='Asha Patel', contact='9000000000', email='asha@example.com', address='Pune')
+        Bottle.objects.bulk_create([Bottle(code=f'SV-{i}') for i in range(1, 4)])
+        bottle_ids = list(Bottle.objects.order_by('id').values_list('id', flat=True))
+
+        save_transactions([Transaction(client=client, delivered_by=user, transaction_type='delivered')], [bottle_ids[:1]])
+        # Both forms validated while SV-1 was in stock; the second save must not deliver it again
+        with self.assertRaises(BottlesMovedError):
+            save_transactions(
+                [Transaction(client=client, delivered_by=user, transaction_type='delivered')], [bottle_ids],
+            )
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(BottleMovement.objects.count(), 1)
+        self.assertEqual(Bottle.objects.filter(status='delivered').count(), 1)
+
+
+class BillPdfFilenameTests(SimpleTestCase):
+    def test_client_name_cannot_add_path_segments(self):
+        filename = bill_pdf_filename({'client_name': '../../Asha/Patel', 'bill_date': '2026-01-02'})
+        self.assertEqual(os.path.basename(filename), filename)
+        self.assertFalse(filename.startswith('.'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class InventorySnapshotTests(TestCase):
+    def test_snapshot_version_changes_when_the_change_commits(self):
+        self.assertEqual(Bottle.inventory_snapshot()['total'], 0)
+        version = cache.get(Bottle.SNAPSHOT_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            Bottle.objects.create(code='SV-1')
+            # Other workers must not cache counts under a new version before the bottle is visible
+            self.assertEqual(cache.get(Bottle.SNAPSHOT_VERSION_KEY), version)
+        self.assertNotEqual(cache.get(Bottle.SNAPSHOT_VERSION_KEY), version)
+        self.assertEqual(Bottle.inventory_snapshot()['total'], 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class BillingLedgerTests(TestCase):
+    """
+    The incrementally kept ClientBottleBalance and DailySalesRollup rows must match a
+    recount from history after every step of the billing lifecycle, driven through the views.
+    """
+
+    def setUp(self):
+        self.client.force_login(benchmark_user())
+        self.customer = Client.objects.create(name='Asha Patel', contact='9000000000', email='asha@example.com', address='Pune')
+        Bottle.objects.bulk_create([Bottle(code=f'SV-{i}') for i in range(1, 11)])
+
+    def assertLedgersMatchHistory(self):
+        self.assertEqual(ClientBottleBalance.rebuild(dry_run=True), [])
+        rollup = DailySalesRollup.objects.order_by('date', 'client_id')
+        fields = ['date', 'client_id', *DailySalesRollup.TOTAL_FIELDS]
+        kept = list(rollup.values(*fields))
+        DailySalesRollup.rebuild()
+        self.assertEqual(kept, list(rollup.values(*fields)))
+
+    def record(self, transaction_type, bottles):
+        response = self.client.post(
+            reverse('transaction_create') + f'?transaction_type={transaction_type}',
+            {'client': self.customer.id, 'transaction_type': transaction_type, 'bottles': bottles},
+        )
+        self.assertEqual(response.status_code, 302)
+        return Transaction.objects.latest('id')
+
+    def test_billing_lifecycle_keeps_ledgers_in_step(self):
+        first = self.record('delivered', 'SV-1..SV-3')
+        self.record('delivered', 'SV-4..SV-8')
+        self.record('delivered', 'SV-9')
+        self.record('returned', 'SV-1, SV-2')
+        self.assertLedgersMatchHistory()
+
+        response = self.client.post(
+            reverse('create_custom_bill', args=[self.customer.id]), {'selected_transactions': [first.id]},
+        )
+        self.assertEqual(response.status_code, 302)
+        custom_bill = Bill.objects.get(bill_type='custom')
+        self.assertLedgersMatchHistory()
+
+        self.assertEqual(self.client.get(reverse('generate_bill', args=[self.customer.id])).status_code, 200)
+        auto_bill = Bill.objects.get(bill_type='auto')
+        # Counted in transactions, as the bill page always has; the custom-billed delivery is left out
+        self.assertEqual((auto_bill.delivered_bottles, auto_bill.returned_bottles), (2, 1))
+        self.assertGreater(auto_bill.total_amount, 0)
+        self.assertLedgersMatchHistory()
+
+        self.assertEqual(self.client.post(reverse('mark_bill_paid', args=[auto_bill.id])).status_code, 302)
+        self.assertLedgersMatchHistory()
+
+        self.assertEqual(self.client.post(reverse('delete_bill', args=[custom_bill.id])).status_code, 302)
+        self.assertFalse(Bill.objects.filter(id=custom_bill.id).exists())
+        self.assertLedgersMatchHistory()
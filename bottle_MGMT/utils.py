@@ -40,3 +40,29 @@ def compute_totals(quantity: int,
         'gst_amount': gst_amount,
         'final': final,
     }
+
+
+def compress_ranges(numbers):
+    """
+    Collapse integers into inclusive (first, last) runs:
+    [101, 102, 103, 110] -> [(101, 103), (110, 110)]
+    """
+    ranges = []
+    for n in sorted(numbers):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], n)
+        else:
+            ranges.append((n, n))
+    return ranges
+
+
+def format_code_ranges(series: str, numbers, limit: int = 20) -> str:
+    """Human readable bottle code ranges, e.g. 'SV-101..SV-180, SV-200' (at most `limit` runs)."""
+    ranges = compress_ranges(numbers)
+    parts = [
+        f"{series}-{first}" if first == last else f"{series}-{first}..{series}-{last}"
+        for first, last in ranges[:limit]
+    ]
+    if len(ranges) > limit:
+        parts.append(f"and {len(ranges) - limit} more ranges")
+    return ', '.join(parts)
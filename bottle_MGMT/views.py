@@ -1,11 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, FileResponse, HttpResponseBadRequest, StreamingHttpResponse
 from .forms import ClientForm, AddBottlesForm
 from .models import Client
-from .forms import TransactionForm
-from .models import Transaction, Bottle, Bill, BillTransaction
+from .forms import TransactionForm, DeliveryRunFormSet, REQUIRED_BOTTLE_STATUS
+from .models import Transaction, Bottle, Bill, BillTransaction, BottleMovement, ClientBottleBalance, DailySalesRollup, TransactionPhoto
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from datetime import timedelta
@@ -15,11 +15,17 @@ from django.contrib.auth.decorators import user_passes_test
 from django.http import HttpResponseForbidden
 from .models import BottlePricing
 from .forms import BottlePricingForm
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from io import BytesIO
-from django.db.models import Q
+from .utils import format_code_ranges
+from .csv_export import (
+    BALANCE_HEADER, BILL_HEADER, TRANSACTION_HEADER, balance_rows, bill_rows, csv_response, transaction_rows,
+)
+from .photo_variants import schedule_photo_variants
+from .media import iter_file_range, media_cache_control, media_etag, media_file, requested_range, sendfile_header
+from .bill_pdf import bill_pdf_data, bill_pdf_filename, get_bill_pdf, invalidate_bill_pdf, iter_bills_zip, schedule_bill_pdf
+from django.db import transaction as db_transaction
+from django.db.models import Q, Count, Prefetch, Exists, OuterRef
+from django.db.models.functions import TruncDate, ExtractMonth
+from django.core.paginator import Paginator
 from datetime import datetime
 
 
@@ -55,12 +61,13 @@ def login_view(request):
     return render(request, 'login.html')
 
 def admin_dashboard(request):
-    total_bottles = Bottle.objects.count()
-    delivered = Bottle.objects.filter(status='delivered').count()
-    returned = Bottle.objects.filter(status='returned').count()
-    in_stock = Bottle.objects.filter(status='in_stock').count()
+    snapshot = Bottle.inventory_snapshot()
+    total_bottles = snapshot['total']
+    delivered = snapshot['delivered']
+    returned = snapshot['returned']
+    in_stock = snapshot['in_stock']
     pending = delivered  # Bottles delivered but not yet returned
-    recent_transactions = Transaction.objects.order_by('-date')[:5]
+    recent_transactions = with_bottles_and_photos(Transaction.objects.order_by('-date'))[:5]
     return render(request, 'admin_dashboard.html', {
         'total_bottles': total_bottles,
         'delivered': delivered,
@@ -71,10 +78,14 @@ def admin_dashboard(request):
     })
 
 def delivery_dashboard(request):
-    delivered = Transaction.objects.filter(delivered_by=request.user, transaction_type='delivered').count()
-    returned = Transaction.objects.filter(delivered_by=request.user, transaction_type='returned').count()
+    counts = Transaction.objects.filter(delivered_by=request.user).aggregate(
+        delivered=Count('id', filter=Q(transaction_type='delivered')),
+        returned=Count('id', filter=Q(transaction_type='returned')),
+    )
+    delivered = counts['delivered']
+    returned = counts['returned']
     pending = delivered - returned
-    recent_transactions = Transaction.objects.filter(delivered_by=request.user).order_by('-date')[:5]
+    recent_transactions = Transaction.objects.filter(delivered_by=request.user).select_related('client').order_by('-date')[:5]
     return render(request, 'delivery_dashboard.html', {
         'delivered': delivered,
         'returned': returned,
@@ -93,50 +104,161 @@ def client_create(request):
         form = ClientForm()
     return render(request, 'client_create.html', {'form': form})
 
+CLIENT_LIST_PAGE_SIZE = 50
+
+# Sortable columns on the client list, mapped to the annotation/field they order by
+CLIENT_SORT_FIELDS = {
+    'name': 'name',
+    'delivered': 'delivered',
+    'returned': 'returned',
+    'pending': 'pending',
+    'unbilled_delivered': 'unbilled_delivered',
+    'unbilled_returned': 'unbilled_returned',
+    'unbilled_pending': 'unbilled_pending',
+}
+
+def annotate_client_stats(clients):
+    """Annotate a Client queryset with delivered/returned/pending and unbilled counts from the balance ledger"""
+    from django.db.models import F
+    from django.db.models.functions import Coalesce
+
+    # Clients without any transactions have no balance row yet
+    return clients.annotate(
+        delivered=Coalesce('bottle_balance__delivered', 0),
+        returned=Coalesce('bottle_balance__returned', 0),
+        unbilled_delivered=Coalesce('bottle_balance__unbilled_delivered', 0),
+        unbilled_returned=Coalesce('bottle_balance__unbilled_returned', 0),
+    ).annotate(
+        pending=F('delivered') - F('returned'),
+        unbilled_pending=F('unbilled_delivered') - F('unbilled_returned'),
+    )
+
 def client_list(request):
     query = request.GET.get('q', '')
     if query:
-        clients = Client.objects.filter(name__icontains=query)
+        # Prefix search over name, company, GST number and contacts, best matches first
+        clients = Client.search(query)
+        default_sort = 'relevance'
     else:
         clients = Client.objects.all()
-    # Add stats for each client
-    from .models import Transaction
+        default_sort = 'name'
+
+    # Per-client stats are read from the balance ledger for the whole list at once
+    clients = annotate_client_stats(clients)
+
+    sort = request.GET.get('sort') or default_sort
+    sort_field = CLIENT_SORT_FIELDS.get(sort.lstrip('-'))
+    if sort == 'relevance' and query:
+        sort_field = 'search_rank'
+    elif not sort_field:
+        sort = 'name'
+        sort_field = 'name'
+    if sort.startswith('-'):
+        clients = clients.order_by(f'-{sort_field}', 'id')
+    else:
+        clients = clients.order_by(sort_field, 'id')
+
+    page_obj = Paginator(clients, CLIENT_LIST_PAGE_SIZE).get_page(request.GET.get('page'))
+
     client_stats = []
-    for client in clients:
-        delivered = Transaction.objects.filter(client=client, transaction_type='delivered').count()
-        returned = Transaction.objects.filter(client=client, transaction_type='returned').count()
-        pending = delivered - returned
-        
-        # Count unbilled transactions for billing info (excluding custom billed transactions)
-        custom_billed_transaction_ids = BillTransaction.objects.filter(
-            bill__client=client, 
-            bill__bill_type='custom'
-        ).values_list('transaction_id', flat=True)
-        
-        unbilled_delivered = Transaction.objects.filter(
-            client=client, 
-            transaction_type='delivered', 
-            billed=False
-        ).exclude(id__in=custom_billed_transaction_ids).count()
-        
-        unbilled_returned = Transaction.objects.filter(
-            client=client, 
-            transaction_type='returned', 
-            billed=False
-        ).exclude(id__in=custom_billed_transaction_ids).count()
-        
-        unbilled_pending = unbilled_delivered - unbilled_returned
-        
+    for client in page_obj:
         client_stats.append({
             'client': client,
-            'delivered': delivered,
-            'returned': returned,
-            'pending': pending,
-            'unbilled_delivered': unbilled_delivered,
-            'unbilled_returned': unbilled_returned,
-            'unbilled_pending': unbilled_pending,
+            'delivered': client.delivered,
+            'returned': client.returned,
+            'pending': client.pending,
+            'unbilled_delivered': client.unbilled_delivered,
+            'unbilled_returned': client.unbilled_returned,
+            'unbilled_pending': client.unbilled_pending,
         })
-    return render(request, 'client_list.html', {'clients': clients, 'query': query, 'client_stats': client_stats})
+    return render(request, 'client_list.html', {
+        'query': query,
+        'sort': sort,
+        'page_obj': page_obj,
+        'client_stats': client_stats,
+    })
+
+# Bottle status after each kind of transaction
+BOTTLE_STATUS_AFTER = {
+    'delivered': 'delivered',
+    'returned': 'in_stock',
+}
+
+class BottlesMovedError(Exception):
+    """Bottles checked by a form were moved by another request before they could be saved"""
+
+BOTTLES_MOVED_MESSAGE = 'Some of these bottles were just moved by another transaction. Check the bottles and submit again.'
+
+def save_transactions(transactions, bottle_ids, photos=None):
+    """
+    Save unsaved transactions together with their bottles in one atomic block.
+    bottle_ids[i] lists the bottle ids for transactions[i] (and photos[i], if given,
+    its uploaded photo files). Bottle links and photos are bulk-inserted and bottle
+    statuses are set with one UPDATE per transaction type. Raises BottlesMovedError,
+    saving nothing, if a bottle no longer has the status its form checked.
+    """
+    ids_by_type = {}
+    for transaction, ids in zip(transactions, bottle_ids):
+        ids_by_type.setdefault(transaction.transaction_type, set()).update(ids)
+
+    with db_transaction.atomic():
+        # The forms checked the statuses before this transaction began; only move bottles that
+        # still have them, so two requests can't both deliver (or return) the same bottle
+        for transaction_type, ids in ids_by_type.items():
+            moved = Bottle.objects.filter(id__in=ids, status=REQUIRED_BOTTLE_STATUS[transaction_type]).update(
+                status=BOTTLE_STATUS_AFTER[transaction_type],
+            )
+            if moved != len(ids):
+                raise BottlesMovedError(BOTTLES_MOVED_MESSAGE)
+
+        transactions = Transaction.objects.bulk_create(transactions)
+
+        Through = Transaction.bottles.through
+        Through.objects.bulk_create([
+            Through(transaction_id=transaction.id, bottle_id=bottle_id)
+            for transaction, ids in zip(transactions, bottle_ids)
+            for bottle_id in ids
+        ], batch_size=500)
+        BottleMovement.objects.bulk_create(
+            BottleMovement.for_transactions(transactions, bottle_ids),
+            batch_size=500,
+        )
+
+        ClientBottleBalance.record_transactions(transactions)
+
+        if photos:
+            transaction_photos = []
+            for transaction, uploads in zip(transactions, photos):
+                for upload in uploads:
+                    photo = TransactionPhoto(transaction_id=transaction.id)
+                    # Moves the streamed temporary file into photo storage
+                    photo.image.save(upload.name, upload, save=False)
+                    transaction_photos.append(photo)
+            transaction_photos = TransactionPhoto.objects.bulk_create(transaction_photos)
+            photo_ids = [photo.id for photo in transaction_photos]
+            db_transaction.on_commit(lambda: [schedule_photo_variants(photo_id) for photo_id in photo_ids])
+    Bottle.invalidate_inventory_snapshot()
+    return transactions
+
+CLIENT_TYPEAHEAD_LIMIT = 20
+
+@login_required
+def client_typeahead(request):
+    """JSON client matches for search-as-you-type pickers: ?q=<text>[&limit=<n>]"""
+    try:
+        limit = min(int(request.GET.get('limit', CLIENT_TYPEAHEAD_LIMIT)), CLIENT_TYPEAHEAD_LIMIT)
+    except ValueError:
+        limit = CLIENT_TYPEAHEAD_LIMIT
+    clients = Client.search(request.GET.get('q', '')).order_by('search_rank', 'name', 'id')
+    return JsonResponse({'results': [
+        {
+            'id': client['id'],
+            'text': client['name'],
+            'company_name': client['company_name'] or '',
+            'contact': client['contact'],
+        }
+        for client in clients.values('id', 'name', 'company_name', 'contact')[:max(limit, 1)]
+    ]})
 
 @login_required
 def transaction_create(request):
@@ -159,28 +281,107 @@ def transaction_create(request):
                 from django.utils import timezone
                 transaction.date = timezone.now()
             
-            # Save the transaction first
-            transaction.save()
-            
-            # Save the many-to-many relationship (bottles)
-            form.save_m2m()
-            
-            # Update bottle status for all bottles in the transaction
-            for bottle in transaction.bottles.all():
-                if transaction.transaction_type == 'delivered':
-                    bottle.status = 'delivered'
-                elif transaction.transaction_type == 'returned':
-                    bottle.status = 'in_stock'
-                bottle.save()
-            return redirect('transaction_list')
+            bottle_ids = form.cleaned_data['bottles']
+            try:
+                save_transactions([transaction], [bottle_ids], photos=[form.cleaned_data['photos']])
+            except BottlesMovedError as e:
+                form.add_error('bottles', str(e))
+            else:
+                return redirect('transaction_list')
     else:
         form = TransactionForm(transaction_type=transaction_type)
-        if not form.fields['bottles'].queryset.exists():
-            if transaction_type == 'delivered':
-                message = 'No bottles available in stock for delivery.'
-            elif transaction_type == 'returned':
-                message = 'No bottles currently with clients for return.'
-    return render(request, 'transaction_create.html', {'form': form, 'transaction_type': transaction_type, 'message': message})
+    bottles = Bottle.objects.all()
+    if form.required_bottle_status:
+        bottles = bottles.filter(status=form.required_bottle_status)
+    has_bottles = bottles.exists()
+    if not has_bottles and request.method != 'POST':
+        if transaction_type == 'delivered':
+            message = 'No bottles available in stock for delivery.'
+        elif transaction_type == 'returned':
+            message = 'No bottles currently with clients for return.'
+    return render(request, 'transaction_create.html', {
+        'form': form,
+        'transaction_type': transaction_type,
+        'message': message,
+        'has_bottles': has_bottles,
+    })
+
+@login_required
+def delivery_run(request):
+    """Record a driver's whole route - deliveries and returns for many clients - in one submission"""
+    if request.method == 'POST':
+        formset = DeliveryRunFormSet(request.POST)
+        if formset.is_valid():
+            now = timezone.now()
+            transactions = []
+            bottle_ids = []
+            for stop in formset.cleaned_data:
+                for transaction_type in ('delivered', 'returned'):
+                    ids = stop.get(f'{transaction_type}_bottle_ids')
+                    if ids:
+                        transactions.append(Transaction(
+                            client=stop['client'],
+                            date=now,
+                            delivered_by=request.user,
+                            transaction_type=transaction_type,
+                        ))
+                        bottle_ids.append(ids)
+            if not transactions:
+                messages.error(request, 'Enter at least one delivered or returned bottle.')
+            else:
+                try:
+                    save_transactions(transactions, bottle_ids)
+                except BottlesMovedError as e:
+                    messages.error(request, str(e))
+                else:
+                    messages.success(request, f'Recorded {len(transactions)} transactions for {len({t.client_id for t in transactions})} clients.')
+                    return redirect('transaction_list')
+    else:
+        formset = DeliveryRunFormSet()
+    return render(request, 'delivery_run.html', {'formset': formset})
+
+TRANSACTION_PAGE_SIZE = 50
+
+def with_bottles_and_photos(transactions):
+    """Load everything the transaction rows and the bottle/photo modal need in a fixed number of queries"""
+    return transactions.select_related('client', 'delivered_by').annotate(
+        bottle_count=Count('bottles', distinct=True),
+    ).prefetch_related(
+        Prefetch('bottles', queryset=Bottle.objects.select_related('category').order_by(*Bottle.CODE_ORDER)),
+        'photos',
+    )
+
+def encode_transaction_cursor(transaction):
+    return f"{transaction.date.isoformat()}|{transaction.id}"
+
+def decode_transaction_cursor(cursor):
+    """Returns (date, id) or None for a missing or malformed cursor"""
+    try:
+        date, transaction_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(date), int(transaction_id)
+    except (AttributeError, ValueError):
+        return None
+
+def parse_filter_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+def filter_transactions(transactions, params):
+    """The transaction list / custom billing filters: client, type, start_date, end_date"""
+    if params.get('client'):
+        transactions = transactions.filter(client_id=params['client'])
+    transaction_type = params.get('type') or params.get('transaction_type')
+    if transaction_type:
+        transactions = transactions.filter(transaction_type=transaction_type)
+    start_date = parse_filter_date(params.get('start_date'))
+    if start_date:
+        transactions = transactions.filter(date__date__gte=start_date)
+    end_date = parse_filter_date(params.get('end_date'))
+    if end_date:
+        transactions = transactions.filter(date__date__lte=end_date)
+    return transactions
 
 @login_required
 def transaction_list(request):
@@ -188,20 +389,56 @@ def transaction_list(request):
         transactions = Transaction.objects.filter(delivered_by=request.user)
     else:
         transactions = Transaction.objects.all()
-    # Filtering
+    transactions = filter_transactions(transactions, request.GET)
     client_id = request.GET.get('client')
-    if client_id:
-        transactions = transactions.filter(client_id=client_id)
     transaction_type = request.GET.get('type')
-    if transaction_type:
-        transactions = transactions.filter(transaction_type=transaction_type)
+
+    # Keyset pagination on (date, id): newest first, "before" pages go back in time
+    # and "after" pages come forward again, so each page costs the same however deep it is
+    before = decode_transaction_cursor(request.GET.get('before'))
+    after = None if before else decode_transaction_cursor(request.GET.get('after'))
+    if before:
+        date, transaction_id = before
+        transactions = transactions.filter(Q(date__lt=date) | Q(date=date, id__lt=transaction_id))
+    elif after:
+        date, transaction_id = after
+        transactions = transactions.filter(Q(date__gt=date) | Q(date=date, id__gt=transaction_id))
+
+    if after:
+        page = list(with_bottles_and_photos(transactions.order_by('date', 'id'))[:TRANSACTION_PAGE_SIZE + 1])
+        has_newer = len(page) > TRANSACTION_PAGE_SIZE
+        page = page[:TRANSACTION_PAGE_SIZE][::-1]
+        has_older = True
+    else:
+        page = list(with_bottles_and_photos(transactions.order_by('-date', '-id'))[:TRANSACTION_PAGE_SIZE + 1])
+        has_older = len(page) > TRANSACTION_PAGE_SIZE
+        page = page[:TRANSACTION_PAGE_SIZE]
+        has_newer = before is not None
+
     return render(request, 'transaction_list.html', {
-        'transactions': transactions,
-        'clients': Client.objects.all(),
+        'transactions': page,
+        # The client filter searches as you type; only the selected client is rendered
+        'clients': Client.objects.filter(id=client_id).only('id', 'name') if client_id else Client.objects.none(),
         'selected_client': client_id,
         'selected_type': transaction_type,
+        'older_cursor': encode_transaction_cursor(page[-1]) if page and has_older else None,
+        'newer_cursor': encode_transaction_cursor(page[0]) if page and has_newer else None,
     })
 
+@login_required
+def export_transactions_csv(request):
+    """Transactions as CSV with the transaction list filters, one row per transaction and its bottle codes"""
+    if request.user.username == 'delivery':
+        transactions = Transaction.objects.filter(delivered_by=request.user)
+    else:
+        transactions = Transaction.objects.all()
+    transactions = filter_transactions(transactions, request.GET).select_related(
+        'client', 'delivered_by',
+    ).prefetch_related(
+        Prefetch('bottles', queryset=Bottle.objects.only('id', 'code', 'series', 'number').order_by(*Bottle.CODE_ORDER)),
+    ).order_by('date', 'id')
+    return csv_response('transactions.csv', TRANSACTION_HEADER, transaction_rows(transactions))
+
 def reports_view(request):
     if request.user.username != 'admin':
         return HttpResponseForbidden('You do not have permission to view this page.')
@@ -250,15 +487,21 @@ def reports_view(request):
 def inventory_view(request):
     status = request.GET.get('status', '')
     code_query = request.GET.get('q', '')
-    bottles = Bottle.objects.all().order_by('code')
+    bottles = Bottle.objects.select_related('category').order_by(*Bottle.CODE_ORDER)
     if status:
         bottles = bottles.filter(status=status)
     if code_query:
-        bottles = bottles.filter(code__icontains=code_query)
-    total = bottles.count()
-    in_stock = bottles.filter(status='in_stock').count()
-    delivered = bottles.filter(status='delivered').count()
-    returned = bottles.filter(status='returned').count()
+        bottles = bottles.filter(Bottle.code_filter(code_query))
+        # Counts for an ad-hoc search can't come from the shared snapshot
+        counts = dict(bottles.order_by().values_list('status').annotate(Count('id')))
+    else:
+        counts = Bottle.inventory_snapshot()
+        if status:
+            counts = {status: counts.get(status, 0)}
+    in_stock = counts.get('in_stock', 0)
+    delivered = counts.get('delivered', 0)
+    returned = counts.get('returned', 0)
+    total = in_stock + delivered + returned
     return render(request, 'inventory.html', {
         'bottles': bottles,
         'total': total,
@@ -269,6 +512,11 @@ def inventory_view(request):
         'code_query': code_query,
     })
 
+@staff_member_required
+def inventory_snapshot_view(request):
+    """Bottle counts by status and category as JSON"""
+    return JsonResponse(Bottle.inventory_snapshot())
+
 @staff_member_required
 def add_bottles_view(request):
     if request.method == 'POST':
@@ -277,19 +525,12 @@ def add_bottles_view(request):
             series = form.cleaned_data['series'].strip().upper()
             start = form.cleaned_data['start']
             end = form.cleaned_data['end']
-            created = 0
-            duplicates = []
-            for i in range(start, end + 1):
-                code = f"{series}-{i}"
-                if not Bottle.objects.filter(code=code).exists():
-                    Bottle.objects.create(code=code, status='in_stock')
-                    created += 1
-                else:
-                    duplicates.append(code)
+            category = form.cleaned_data['category']
+            created, duplicates = Bottle.bulk_create_bottles(start, end, series=series, category=category)
             if created:
                 messages.success(request, f"{created} bottles ({series}-{start} to {series}-{end}) added to inventory.")
             if duplicates:
-                messages.warning(request, f"Skipped duplicates: {', '.join(duplicates)}")
+                messages.warning(request, f"Skipped {len(duplicates)} duplicates: {format_code_ranges(series, duplicates)}")
             return redirect('inventory')
     else:
         form = AddBottlesForm()
@@ -297,9 +538,21 @@ def add_bottles_view(request):
 
 @staff_member_required
 def bottle_photos_view(request, code):
-    bottle = Bottle.objects.get(code=code)
-    transactions = Transaction.objects.filter(bottle=bottle).order_by('-date')
-    return render(request, 'bottle_photos.html', {'bottle': bottle, 'transactions': transactions})
+    bottle = get_object_or_404(Bottle, code=code)
+    movements = list(
+        BottleMovement.history(bottle).select_related(
+            'client', 'transaction__delivered_by'
+        ).prefetch_related('transaction__photos')
+    )
+    # The newest movement tells us who holds the bottle now
+    last_movement = movements[0] if movements else None
+    current_holder = last_movement.client if last_movement and last_movement.transaction_type == 'delivered' else None
+    return render(request, 'bottle_photos.html', {
+        'bottle': bottle,
+        'movements': movements,
+        'last_movement': last_movement,
+        'current_holder': current_holder,
+    })
 
 @staff_member_required
 def pricing_view(request):
@@ -314,6 +567,8 @@ def pricing_view(request):
         form = BottlePricingForm(instance=pricing)
     return render(request, 'pricing.html', {'form': form, 'pricing': pricing})
 
+CUSTOM_BILLING_DAYS_PER_PAGE = 14
+
 @staff_member_required
 def custom_billing_view(request, client_id):
     """View client transactions for custom billing"""
@@ -345,30 +600,38 @@ def custom_billing_view(request, client_id):
     if transaction_type:
         transactions = transactions.filter(transaction_type=transaction_type)
     
+    # Flag transactions that already belong to a custom bill
+    transactions = transactions.annotate(
+        custom_billed=Exists(BillTransaction.objects.filter(
+            transaction=OuterRef('pk'),
+            bill__bill_type='custom',
+        )),
+    )
+
+    # Paginate by calendar day so a page never splits a day's transactions
+    days = transactions.annotate(day=TruncDate('date')).order_by('-day').values_list('day', flat=True).distinct()
+    page_obj = Paginator(days, CUSTOM_BILLING_DAYS_PER_PAGE).get_page(request.GET.get('page'))
+    page_days = list(page_obj)
+    if page_days:
+        transactions = with_bottles_and_photos(
+            transactions.filter(date__date__range=[page_days[-1], page_days[0]])
+        )
+    else:
+        transactions = Transaction.objects.none()
+
     # Group transactions by date
-    transactions_by_date = {}
+    transactions_by_date = {day: [] for day in page_days}
     for transaction in transactions:
-        date_key = transaction.date.strftime('%Y-%m-%d')
-        if date_key not in transactions_by_date:
-            transactions_by_date[date_key] = []
-        transactions_by_date[date_key].append(transaction)
-    
+        transactions_by_date[timezone.localtime(transaction.date).date()].append(transaction)
+
     # Get pricing
     price = BottlePricing.get_solo().price
-    
-    # Get already custom billed transactions
-    custom_billed_transactions = set()
-    custom_bills = Bill.objects.filter(client=client, bill_type='custom')
-    for bill in custom_bills:
-        custom_billed_transactions.update(
-            bill.bill_transactions.values_list('transaction_id', flat=True)
-        )
-    
+
     context = {
         'client': client,
         'transactions_by_date': transactions_by_date,
         'price': price,
-        'custom_billed_transactions': custom_billed_transactions,
+        'page_obj': page_obj,
         'start_date': start_date,
         'end_date': end_date,
         'transaction_type': transaction_type,
@@ -396,16 +659,11 @@ def create_custom_bill(request, client_id):
     )
     
     # Check if any transactions are already custom billed
-    custom_billed_transactions = set()
-    custom_bills = Bill.objects.filter(client=client, bill_type='custom')
-    for bill in custom_bills:
-        custom_billed_transactions.update(
-            bill.bill_transactions.values_list('transaction_id', flat=True)
-        )
-    
-    already_billed = [t for t in selected_transactions if t.id in custom_billed_transactions]
+    already_billed = list(selected_transactions.filter(
+        bill_transactions__bill__bill_type='custom'
+    ).values_list('id', flat=True).distinct())
     if already_billed:
-        messages.error(request, f'Some transactions are already custom billed: {", ".join([str(t.id) for t in already_billed])}')
+        messages.error(request, f'Some transactions are already custom billed: {", ".join([str(t) for t in already_billed])}')
         return redirect('custom_billing', client_id=client_id)
     
     # Calculate bill amounts
@@ -420,29 +678,34 @@ def create_custom_bill(request, client_id):
     price = BottlePricing.get_solo().price
     total_amount = pending_count * price
     
-    # Create custom bill
-    bill = Bill.objects.create(
-        client=client,
-        delivered_bottles=delivered_count,
-        returned_bottles=returned_count,
-        pending_bottles=pending_count,
-        price_per_bottle=price,
-        total_amount=total_amount,
-        generated_by=request.user,
-        bill_type='custom',
-        description=request.POST.get('description', 'Custom bill for selected transactions')
-    )
-    
-    # Create BillTransaction records
-    bill_transactions = []
-    for transaction in selected_transactions:
-        bill_transactions.append(BillTransaction(bill=bill, transaction=transaction))
-    
-    BillTransaction.objects.bulk_create(bill_transactions)
-    
-    # Mark transactions as billed
-    selected_transactions.update(billed=True)
-    
+    with db_transaction.atomic():
+        # Create custom bill
+        bill = Bill.objects.create(
+            client=client,
+            delivered_bottles=delivered_count,
+            returned_bottles=returned_count,
+            pending_bottles=pending_count,
+            price_per_bottle=price,
+            total_amount=total_amount,
+            generated_by=request.user,
+            bill_type='custom',
+            description=request.POST.get('description', 'Custom bill for selected transactions')
+        )
+
+        # Create BillTransaction records
+        bill_transactions = []
+        for transaction in selected_transactions:
+            bill_transactions.append(BillTransaction(bill=bill, transaction=transaction))
+
+        BillTransaction.objects.bulk_create(bill_transactions)
+
+        # Mark transactions as billed
+        selected_transactions.update(billed=True)
+
+        ClientBottleBalance.rebuild(Client.objects.filter(id=client.id))
+        DailySalesRollup.add_bill(bill)
+        db_transaction.on_commit(lambda: schedule_bill_pdf(bill.id))
+
     messages.success(request, f'Custom bill created successfully for {pending_count} pending bottles.')
     
     # Redirect to bill view
@@ -476,37 +739,22 @@ def generate_bill(request, client_id, bill_id=None):
     
     # Original automated billing logic
     # Only count unbilled transactions that are not in custom bills
-    delivered = Transaction.objects.filter(client=client, transaction_type='delivered', billed=False).count()
-    returned = Transaction.objects.filter(client=client, transaction_type='returned', billed=False).count()
-    pending = delivered - returned
     price = BottlePricing.get_solo().price
-    total = pending * price
-    
+    # The counts come from the ledger under create_auto_bills' write lock, so the bill covers
+    # exactly the transactions it marks billed
+    bills = Bill.create_auto_bills([client.id], price, generated_by=request.user)
+
     # Check if there are any transactions to bill
-    if delivered == 0 and returned == 0:
+    if not bills:
         messages.warning(request, 'No new transactions to bill for this client.')
         return redirect('client_list')
-    
-    # Save bill to database
-    bill = Bill.objects.create(
-        client=client,
-        delivered_bottles=delivered,
-        returned_bottles=returned,
-        pending_bottles=pending,
-        price_per_bottle=price,
-        total_amount=total,
-        generated_by=request.user,
-        bill_type='auto'
-    )
-    
-    # Mark all unbilled transactions as billed (excluding those already in custom bills)
-    Transaction.objects.filter(
-        client=client, 
-        billed=False
-    ).exclude(
-        id__in=BillTransaction.objects.filter(bill__client=client, bill__bill_type='custom').values_list('transaction_id', flat=True)
-    ).update(billed=True)
-    
+
+    bill = bills[0]
+    delivered = bill.delivered_bottles
+    returned = bill.returned_bottles
+    pending = bill.pending_bottles
+    total = bill.total_amount
+
     context = {
         'client': client,
         'delivered': delivered,
@@ -526,55 +774,21 @@ def generate_bill(request, client_id, bill_id=None):
     return render(request, 'generate_bill.html', context)
 
 def generate_pdf_bill(request, context):
-    """Generate PDF version of the bill"""
-    # Create a BytesIO object to receive PDF data.
-    buffer = BytesIO()
-    # Create a canvas.
-    p = canvas.Canvas(buffer, pagesize=letter)
-    
-    # Set document information
-    p.setTitle("Bill")
-    p.setAuthor("O2 Bottle Management System")
-    p.setSubject("Bill for " + context["client"].name)
-    p.setKeywords("O2 Bottle, Bill, Management")
-    
-    # Set font
-    p.setFont("Helvetica", 12)
-    
-    # Draw title
-    p.drawString(1 * inch, 10 * inch, "O2 Bottle Management System")
-    p.drawString(1 * inch, 9.5 * inch, "Bill")
-    
-    # Draw client details
-    p.drawString(1 * inch, 9 * inch, "Client: " + context["client"].name)
-    p.drawString(1 * inch, 8.5 * inch, "Address: " + context["client"].address)
-    p.drawString(1 * inch, 8 * inch, "Contact: " + context["client"].contact)
-    
-    # Draw bill details
-    p.drawString(1 * inch, 7.5 * inch, "Bill Date: " + context["bill_date"].strftime("%Y-%m-%d"))
-    p.drawString(1 * inch, 7 * inch, "Price per Bottle: ₹" + str(context["price"]))
-    p.drawString(1 * inch, 6.5 * inch, "Total Pending Bottles: " + str(context["pending"]))
-    p.drawString(1 * inch, 6 * inch, "Total Amount: ₹" + str(context["total"]))
-    
-    # Draw generated by
-    p.drawString(1 * inch, 5.5 * inch, "Generated by: " + context["bill"].generated_by.username)
-    
-    # Save the PDF to the BytesIO buffer.
-    p.save()
-    
-    # Seek to the beginning of the BytesIO buffer so we can read its contents.
-    buffer.seek(0)
-    
-    # Prepare the HTTP response.
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="bill_{context["client"].name}_{context["bill_date"].strftime("%Y%m%d")}.pdf"'
-    return response
+    """Send the PDF version of the bill, rendered once and then served from the PDF cache"""
+    bill = context['bill']
+    path = get_bill_pdf(bill)
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=bill_pdf_filename(bill_pdf_data(bill)),
+        content_type='application/pdf',
+    )
 
 @staff_member_required
 def bill_history(request, client_id):
     """View bill history for a specific client"""
     client = get_object_or_404(Client, id=client_id)
-    bills = Bill.objects.filter(client=client)
+    bills = Bill.objects.filter(client=client).select_related('generated_by')
     return render(request, 'bill_history.html', {
         'client': client,
         'bills': bills,
@@ -587,10 +801,17 @@ def mark_bill_paid(request, bill_id):
     bill = get_object_or_404(Bill, id=bill_id)
     
     if request.method == 'POST':
-        bill.paid = True
-        bill.paid_date = timezone.now()
-        bill.paid_by = request.user
-        bill.save()
+        with db_transaction.atomic():
+            # Conditional update so a bill is only ever counted as paid once
+            newly_paid = Bill.objects.filter(id=bill.id, paid=False).update(
+                paid=True,
+                paid_date=timezone.now(),
+                paid_by=request.user,
+            )
+            if newly_paid:
+                DailySalesRollup.mark_paid(bill)
+                # The cached PDF carries the old paid state
+                db_transaction.on_commit(lambda: (invalidate_bill_pdf(bill.id), schedule_bill_pdf(bill.id)))
         messages.success(request, f'Bill #{bill.id} marked as paid successfully.')
         return redirect('bill_history', client_id=bill.client.id)
     
@@ -607,19 +828,75 @@ def delete_bill(request, bill_id):
         return redirect('bill_history', client_id=bill.client.id)
     
     if request.method == 'POST':
-        # Restore transactions to unbilled status
-        Transaction.objects.filter(
-            client=bill.client,
-            billed=True
-        ).update(billed=False)
-        
-        # Delete the bill
-        bill.delete()
+        with db_transaction.atomic():
+            # Restore transactions to unbilled status
+            Transaction.objects.filter(
+                client=bill.client,
+                billed=True
+            ).update(billed=False)
+
+            # Delete the bill
+            DailySalesRollup.remove_bill(bill)
+            bill.delete()
+            db_transaction.on_commit(lambda: invalidate_bill_pdf(bill_id))
+
+            ClientBottleBalance.rebuild(Client.objects.filter(id=bill.client_id))
         messages.success(request, f'Bill #{bill_id} deleted successfully. Transactions restored to unbilled status.')
         return redirect('bill_history', client_id=bill.client.id)
     
     return render(request, 'delete_bill.html', {'bill': bill})
 
+BILL_EXPORT_PAID_FILTERS = {'': None, 'paid': True, 'unpaid': False}
+
+@staff_member_required
+def export_bills_csv(request):
+    """Bills as CSV: ?client=&type=auto|custom&status=paid|unpaid&start_date=&end_date="""
+    bills = Bill.objects.select_related('client', 'generated_by').order_by('bill_date', 'id')
+    if request.GET.get('client'):
+        bills = bills.filter(client_id=request.GET['client'])
+    if request.GET.get('type'):
+        bills = bills.filter(bill_type=request.GET['type'])
+    paid = BILL_EXPORT_PAID_FILTERS.get(request.GET.get('status', ''))
+    if paid is not None:
+        bills = bills.filter(paid=paid)
+    start_date = parse_filter_date(request.GET.get('start_date'))
+    if start_date:
+        bills = bills.filter(bill_date__date__gte=start_date)
+    end_date = parse_filter_date(request.GET.get('end_date'))
+    if end_date:
+        bills = bills.filter(bill_date__date__lte=end_date)
+    return csv_response('bills.csv', BILL_HEADER, bill_rows(bills))
+
+@staff_member_required
+def export_balances_csv(request):
+    """Client bottle balances as CSV, with the client list search, so it exports the rows the list shows"""
+    query = request.GET.get('q', '')
+    clients = Client.search(query) if query else Client.objects.all()
+    clients = annotate_client_stats(clients).order_by('name', 'id')
+    return csv_response('client_balances.csv', BALANCE_HEADER, balance_rows(clients))
+
+@staff_member_required
+def export_bills_zip(request):
+    """Stream a ZIP of bill PDFs: ?start=YYYY-MM-DD&end=YYYY-MM-DD[&client=<id>][&status=paid|unpaid]"""
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date
+
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.GET.get('start', '')) or today.replace(day=1)
+        end = parse_date(request.GET.get('end', '')) or today
+        client_id = int(request.GET['client']) if request.GET.get('client') else None
+    except ValueError:
+        return HttpResponseBadRequest('Invalid start, end or client.')
+    status = request.GET.get('status', '')
+    if status not in BILL_EXPORT_PAID_FILTERS or start > end:
+        return HttpResponseBadRequest('Invalid status or date range.')
+
+    bills = Bill.in_date_range(start, end, client_id=client_id, paid=BILL_EXPORT_PAID_FILTERS[status])
+    response = StreamingHttpResponse(iter_bills_zip(bills.iterator(chunk_size=500)), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="bills_{start:%Y%m%d}_{end:%Y%m%d}.zip"'
+    return response
+
 @staff_member_required
 def sales_analytics(request):
     """Comprehensive sales analytics dashboard"""
@@ -655,60 +932,91 @@ def sales_analytics(request):
     # Get all bills
     all_bills = Bill.objects.all()
     
+    # Totals are read from the daily rollup rather than scanning every bill
+    rollup = DailySalesRollup.objects.all()
+
     # Sales Analytics
-    def get_sales_data(bills_qs):
-        total_bills = bills_qs.count()
-        total_amount = bills_qs.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_bottles_delivered = bills_qs.aggregate(Sum('delivered_bottles'))['delivered_bottles__sum'] or 0
-        total_bottles_returned = bills_qs.aggregate(Sum('returned_bottles'))['returned_bottles__sum'] or 0
-        total_pending_bottles = bills_qs.aggregate(Sum('pending_bottles'))['pending_bottles__sum'] or 0
-        paid_bills = bills_qs.filter(paid=True)
-        paid_amount = paid_bills.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
+    def sales_aggregates(prefix, period_filter):
+        """Conditional aggregates for one reporting window, to be evaluated in a shared query"""
+        return {
+            f'{prefix}_total_bills': Sum('bill_count', filter=period_filter, default=0),
+            f'{prefix}_total_amount': Sum('total_amount', filter=period_filter),
+            f'{prefix}_total_bottles_delivered': Sum('delivered_bottles', filter=period_filter),
+            f'{prefix}_total_bottles_returned': Sum('returned_bottles', filter=period_filter),
+            f'{prefix}_total_pending_bottles': Sum('pending_bottles', filter=period_filter),
+            f'{prefix}_paid_amount': Sum('paid_amount', filter=period_filter),
+        }
+
+    def get_sales_data(totals, prefix):
+        total_amount = totals[f'{prefix}_total_amount'] or 0
+        paid_amount = totals[f'{prefix}_paid_amount'] or 0
         unpaid_amount = total_amount - paid_amount
         
         return {
-            'total_bills': total_bills,
+            'total_bills': totals[f'{prefix}_total_bills'],
             'total_amount': total_amount,
-            'total_bottles_delivered': total_bottles_delivered,
-            'total_bottles_returned': total_bottles_returned,
-            'total_pending_bottles': total_pending_bottles,
+            'total_bottles_delivered': totals[f'{prefix}_total_bottles_delivered'] or 0,
+            'total_bottles_returned': totals[f'{prefix}_total_bottles_returned'] or 0,
+            'total_pending_bottles': totals[f'{prefix}_total_pending_bottles'] or 0,
             'paid_amount': paid_amount,
             'unpaid_amount': unpaid_amount,
             'payment_rate': (paid_amount / total_amount * 100) if total_amount > 0 else 0
         }
     
-    # Daily, Weekly, Monthly, Yearly sales
-    daily_sales = get_sales_data(all_bills.filter(bill_date__date=today))
-    weekly_sales = get_sales_data(all_bills.filter(bill_date__date__range=[week_start, week_end]))
-    monthly_sales = get_sales_data(all_bills.filter(bill_date__date__range=[month_start, month_end]))
-    yearly_sales = get_sales_data(all_bills.filter(bill_date__date__range=[year_start, year_end]))
-    
-    # Selected period sales
+    # Selected period
     selected_start = datetime(selected_year, selected_month, 1).date()
     selected_end = (selected_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-    selected_sales = get_sales_data(all_bills.filter(bill_date__date__range=[selected_start, selected_end]))
+
+    # Daily, Weekly, Monthly, Yearly and selected period sales in one pass over the days they span
+    windows = {
+        'daily': (today, today),
+        'weekly': (week_start, week_end),
+        'monthly': (month_start, month_end),
+        'yearly': (year_start, year_end),
+        'selected': (selected_start, selected_end),
+    }
+    aggregates = {}
+    for prefix, date_range in windows.items():
+        aggregates.update(sales_aggregates(prefix, Q(date__range=date_range)))
+    totals = rollup.filter(
+        date__range=[
+            min(start for start, _ in windows.values()),
+            max(end for _, end in windows.values()),
+        ]
+    ).aggregate(**aggregates)
+
+    daily_sales = get_sales_data(totals, 'daily')
+    weekly_sales = get_sales_data(totals, 'weekly')
+    monthly_sales = get_sales_data(totals, 'monthly')
+    yearly_sales = get_sales_data(totals, 'yearly')
+    selected_sales = get_sales_data(totals, 'selected')
     
     # Current stock status
-    total_stock = Bottle.objects.count()
-    in_stock = Bottle.objects.filter(status='in_stock').count()
-    delivered_stock = Bottle.objects.filter(status='delivered').count()
-    returned_stock = Bottle.objects.filter(status='returned').count()
+    snapshot = Bottle.inventory_snapshot()
+    total_stock = snapshot['total']
+    in_stock = snapshot['in_stock']
+    delivered_stock = snapshot['delivered']
+    returned_stock = snapshot['returned']
     
     # Calculate percentages
     in_stock_percent = round((in_stock / total_stock * 100) if total_stock > 0 else 0, 1)
     delivered_percent = round((delivered_stock / total_stock * 100) if total_stock > 0 else 0, 1)
     returned_percent = round((returned_stock / total_stock * 100) if total_stock > 0 else 0, 1)
     
-    # Client-wise analytics
+    # Client-wise analytics, one GROUP BY client
     client_analytics = []
-    clients = Client.objects.all()
+    clients = Client.objects.annotate(
+        total_delivered=Sum('daily_sales__delivered_bottles'),
+        total_returned=Sum('daily_sales__returned_bottles'),
+        total_amount=Sum('daily_sales__total_amount'),
+        paid_amount=Sum('daily_sales__paid_amount'),
+    )
     for client in clients:
-        client_bills = all_bills.filter(client=client)
-        total_delivered = client_bills.aggregate(Sum('delivered_bottles'))['delivered_bottles__sum'] or 0
-        total_returned = client_bills.aggregate(Sum('returned_bottles'))['returned_bottles__sum'] or 0
+        total_delivered = client.total_delivered or 0
+        total_returned = client.total_returned or 0
         total_pending = total_delivered - total_returned
-        total_amount = client_bills.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        paid_amount = client_bills.filter(paid=True).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
+        total_amount = client.total_amount or 0
+        paid_amount = client.paid_amount or 0
         unpaid_amount = total_amount - paid_amount
         
         client_analytics.append({
@@ -725,22 +1033,25 @@ def sales_analytics(request):
     # Sort clients by total amount (highest first)
     client_analytics.sort(key=lambda x: x['total_amount'], reverse=True)
     
-    # Monthly trend data for charts
+    # Monthly trend data for charts, one GROUP BY month
+    trend_rows = rollup.filter(date__year=selected_year).annotate(
+        month=ExtractMonth('date')
+    ).order_by().values('month').annotate(
+        amount=Sum('total_amount'),
+        bottles=Sum('delivered_bottles'),
+    )
+    trend_by_month = {row['month']: row for row in trend_rows}
     monthly_trend = []
     for month in range(1, 13):
-        month_start = datetime(selected_year, month, 1).date()
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        month_bills = all_bills.filter(bill_date__date__range=[month_start, month_end])
-        month_amount = month_bills.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        month_bottles = month_bills.aggregate(Sum('delivered_bottles'))['delivered_bottles__sum'] or 0
+        row = trend_by_month.get(month, {})
         monthly_trend.append({
             'month': calendar.month_name[month],
-            'amount': month_amount,
-            'bottles': month_bottles
+            'amount': row.get('amount') or 0,
+            'bottles': row.get('bottles') or 0
         })
     
     # Recent transactions
-    recent_bills = all_bills.order_by('-bill_date')[:10]
+    recent_bills = all_bills.select_related('client').order_by('-bill_date')[:10]
     
     # Top performing clients
     top_clients = sorted(client_analytics, key=lambda x: x['total_amount'], reverse=True)[:5]
@@ -783,16 +1094,65 @@ def logout_view(request):
     logout(request)
     return redirect('login')
 
+@login_required
+def serve_media(request, path):
+    """Uploaded photos and QR codes with conditional GETs, byte ranges and cache headers"""
+    import mimetypes
+    from django.utils.cache import get_conditional_response
+    from django.utils.http import http_date
+
+    path, fullpath, stat = media_file(path)
+    etag = media_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        sendfile = sendfile_header(path, fullpath)
+        byte_range = None if sendfile else requested_range(request, stat.st_size, etag, last_modified)
+        if sendfile:
+            # The front-end server sends the bytes (and handles Range itself)
+            response = HttpResponse(content_type=content_type)
+            response[sendfile[0]] = sendfile[1]
+        elif byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(iter_file_range(fullpath, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = media_cache_control(path)
+    return response
+
+@staff_member_required
+def debug_profile(request):
+    """SQL profiles of the last requests served by this process (needs SQL_PROFILING)"""
+    from django.conf import settings
+    from .middleware import recent_profiles
+
+    return render(request, 'debug_profile.html', {
+        'enabled': settings.SQL_PROFILING,
+        'profiles': recent_profiles(),
+        'repeat_threshold': settings.SQL_PROFILE_REPEAT_THRESHOLD,
+    })
+
 def debug_photos(request):
     """Debug view to test photo URLs"""
-    transactions = Transaction.objects.all()[:5]
+    # Photos live on TransactionPhoto; show each transaction's first one
+    transactions = Transaction.objects.prefetch_related('photos')[:5]
     photo_info = []
     for t in transactions:
+        photo = next(iter(t.photos.all()), None)
         photo_info.append({
             'id': t.id,
-            'photo_path': str(t.photo),
-            'photo_url': t.photo.url if t.photo else 'No photo',
-            'photo_exists': t.photo and t.photo.storage.exists(t.photo.name) if t.photo else False,
+            'photo_path': photo.image.name if photo else '',
+            'photo_url': photo.image.url if photo else 'No photo',
+            'photo_exists': photo.image.storage.exists(photo.image.name) if photo else False,
         })
     return render(request, 'debug_photos.html', {'photo_info': photo_info})
 
@@ -846,7 +1206,7 @@ def category_create(request):
     else:
         form = BottleCategoryForm()
     
-    return render(request, 'category_create.html', {'form': form})
+    return render(request, 'category_form.html', {'form': form})
 
 @staff_member_required
 def category_edit(request, category_id):
@@ -865,4 +1225,4 @@ def category_edit(request, category_id):
     else:
         form = BottleCategoryForm(instance=category)
     
-    return render(request, 'category_edit.html', {'form': form, 'category': category})
+    return render(request, 'category_form.html', {'form': form, 'category': category, 'edit': True})